@@ -1 +1,5 @@
 from .algorithm import *
+from .ordering import *
+from .stats import *
+from .transposition import *
+from .worker import *
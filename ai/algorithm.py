@@ -1,57 +1,157 @@
 import logging
-from copy import deepcopy
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, ContextManager, Iterator
 
-import pygame
+from ai.ordering import MoveOrdering
+from ai.stats import TRACE, DepthStats, SearchStats
+from ai.tablebase import WIN_VALUE, Tablebase
+from ai.transposition import Bound, TranspositionTable
+from checker.bitboard import Move, Play
 from checker.board import Board
-from checker.constants import Colors, ColorType, Coordinate
-from checker.piece import Piece
+from checker.constants import Colors, ColorType
+from checker.zobrist import SIDE_KEYS
+
+if TYPE_CHECKING:
+    # NumPy is only needed when an evaluator is passed in
+    from ai.evaluation import Evaluator
 
 
 class Algorithm:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        table: TranspositionTable | None = None,
+        ordering: MoveOrdering | None = None,
+        quiescence_depth: int = 8,
+        evaluator: 'Evaluator | None' = None,
+        tablebase: Tablebase | None = None
+    ) -> None:
+        """
+        `quiescence_depth` caps the capture-only plies past the horizon, 0
+        turns it off. With an `evaluator` the quiet children of depth 1 nodes
+        are scored in one batch instead of `Board.evaluate` each. Positions
+        with few enough pieces are looked up in the `tablebase`, if any.
+        """
+
         self.logger = logging.getLogger(__name__)
         self.logger.info('Initalizing AI algorithm')
 
-    def simulate_move(self,  board: Board, piece: Piece, move: Coordinate):
-        board.move_piece(piece, move[0], move[1])
-        return board
-
-    def draw_moves(self, board: Board, piece: Piece, window: pygame.Surface):
-        valid_moves = board.get_valid_moves(piece)
-        board.draw(window)
-        pygame.draw.circle(window, (0, 255, 0), (piece.x, piece.y), 50, 5)
-        board.draw_valid_moves(window, valid_moves)
-        pygame.display.update()
-        pygame.time.delay(100)
-
-    def get_all_moves(self, board: Board, color: ColorType):
-        moves: list[Board] = []
-
-        for piece in board.get_all_pieces(color):
-            # self.logger.info(f"Getting valid moves for {piece}")
-
-            valid_moves = board.get_valid_moves(piece)
-            for move in valid_moves:
-                # self.logger.info(f"Moving {piece} to {move}")
-                # self.draw_moves(board, piece, board.window)
-                board_copy = deepcopy(board)
-                piece_copy = board_copy.get_piece(piece.row, piece.col)
-                if piece_copy is None:
-                    continue
-                board_copy = self.simulate_move(board_copy, piece_copy, move)
-                moves.append(board_copy)
+        self.table = table if table is not None else TranspositionTable()
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        self.quiescence_depth = quiescence_depth
+        self.evaluator = evaluator
+        self.tablebase = tablebase
 
-        return moves
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.selective_depth = 0
+        self._leaves = 0
+        # Statistics of the last top-level search
+        self.stats = SearchStats()
+        self._trace = False
+        self._profile: ContextManager | None = None
+        self.cancelled = threading.Event()
+        self._deadline: float | None = None
+        self._stopped = False
+        self._root_depth = 0
+        self._pv: list[Move] = []
+        self._follow_pv = False
+
+    def profile_next(self, hook: ContextManager):
+        """
+        Run the next minimax, alpha_beta or iterative_deepening call inside
+        `hook`, e.g. `ai.profiling.cprofile(path)` or a sampling profiler.
+        """
+
+        self._profile = hook
+
+    @contextmanager
+    def _search(self) -> Iterator[SearchStats]:
+        """ Fills a fresh `stats` from the counters' growth over one top-level search """
+
+        hook, self._profile = self._profile, None
+        nodes, leaves, quiescence = self.nodes, self._leaves, self.quiescence_nodes
+        tt_hits, tt_cutoffs = self.table.hits, self.table.cutoffs
+        cutoffs = self.ordering.cutoffs
+        tablebase_hits = self.tablebase.hits if self.tablebase is not None else 0
+
+        self.stats = stats = SearchStats()
+        self.selective_depth = 0
+        # Checked once here, so per-node tracing costs one attribute test when off
+        self._trace = self.logger.isEnabledFor(TRACE)
+        start = time.perf_counter()
+
+        with hook if hook is not None else nullcontext():
+            yield stats
+
+        stats.seconds = time.perf_counter() - start
+        stats.nodes = self.nodes - nodes
+        stats.leaves = self._leaves - leaves
+        stats.quiescence_nodes = self.quiescence_nodes - quiescence
+        stats.tt_hits = self.table.hits - tt_hits
+        stats.tt_cutoffs = self.table.cutoffs - tt_cutoffs
+        stats.cutoffs = self.ordering.cutoffs - cutoffs
+        if self.tablebase is not None:
+            stats.tablebase_hits = self.tablebase.hits - tablebase_hits
+        stats.max_depth = max(self._root_depth, self.selective_depth)
+        self.logger.info(f"Search finished: {stats.summary()}")
 
-    def minimax(self, board: Board, depth: int, max_player: ColorType):
-        if depth == 0 or board.check_winner() != None:
-            return board.evaluate(), board
+    def _evaluate(self, board: Board) -> float:
+        self._leaves += 1
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(board)
+        return board.evaluate()
+
+    def _terminal_value(self, winner: ColorType | str, ply: int) -> float:
+        """ A finished game `ply` plies from the root, on the tablebase's scale """
+
+        self._leaves += 1
+        if winner == Colors.RED:
+            return WIN_VALUE - ply
+        if winner == Colors.WHITE:
+            return ply - WIN_VALUE
+        return 0.0
+
+    def simulate_move(self, board: Board, move: Move):
+        return board.make_move(move)
+
+    def get_all_moves(self, board: Board, color: ColorType) -> list[Move]:
+        return board.get_moves(color)
+
+    def _play(self, board: Board, move: Move | None) -> Play | None:
+        """ The chosen root move spelled out for the caller to apply """
+
+        if move is None:
+            return None
+        return board.describe(move)
+
+    def minimax(self, board: Board, depth: int, max_player: ColorType) -> tuple[float, Play | None]:
+        with self._search():
+            self._root_depth = depth
+            value, move = self._minimax(board, depth, max_player)
+        return value, self._play(board, move)
+
+    def _minimax(
+        self,
+        board: Board,
+        depth: int,
+        max_player: ColorType
+    ) -> tuple[float, Move | None]:
+        self.nodes += 1
+        winner = board.check_winner()
+        if winner is not None:
+            return self._terminal_value(winner, self._root_depth - depth), None
+        if depth == 0:
+            return self._evaluate(board), None
 
         if max_player:
             maxEval = float('-inf')
             best_move = None
             for move in self.get_all_moves(board, Colors.RED):
-                evaluation: float = self.minimax(move, depth-1, False)[0]
+                record = self.simulate_move(board, move)
+                evaluation: float = self._minimax(board, depth-1, False)[0]
+                board.undo_move(record)
                 maxEval = max(maxEval, evaluation)
                 if maxEval == evaluation:
                     best_move = move
@@ -61,49 +161,373 @@ class Algorithm:
             minEval = float('inf')
             best_move = None
             for move in self.get_all_moves(board, Colors.WHITE):
-                evaluation = self.minimax(move, depth-1, True)[0]
+                record = self.simulate_move(board, move)
+                evaluation = self._minimax(board, depth-1, True)[0]
+                board.undo_move(record)
                 minEval = min(minEval, evaluation)
                 if minEval == evaluation:
                     best_move = move
 
             return minEval, best_move
 
-    def alpha_beta(self, board: Board, depth: int, max_player: bool, alpha: float, beta: float):
-        self.logger.info(f"Alpha-beta search started. Depth: {depth}")
-        if depth == 0 or board.check_winner() != None:
-            value = board.evaluate()
-            self.logger.info(f"Value: {value}")
-            return value, board
+    def alpha_beta(
+        self,
+        board: Board,
+        depth: int,
+        max_player: bool,
+        alpha: float,
+        beta: float
+    ) -> tuple[float, Play | None]:
+        with self._search():
+            # Left over from a cancelled search, which would stop this one at once
+            self._stopped = False
+            self._deadline = None
+            self._root_depth = depth
+            self._pv = []
+            self.ordering.new_search()
+            value, move = self._alpha_beta(board, depth, max_player, alpha, beta)
+        if self._stopped:
+            # A partial search's move is no better than a guess
+            return value, None
+        return value, self._play(board, move)
 
-        if max_player:
+    def search_move(
+        self,
+        board: Board,
+        move: Move,
+        depth: int,
+        max_player: bool,
+        alpha: float = float('-inf'),
+        beta: float = float('inf')
+    ) -> float:
+        """ Value of playing `move` for the side to move, searched to `depth` plies in total """
+
+        self._stopped = False
+        self._deadline = None
+        self._root_depth = depth
+        self._pv = []
+        self.ordering.new_search()
+        record = self.simulate_move(board, move)
+        value = self._alpha_beta(board, depth-1, not max_player, alpha, beta)[0]
+        board.undo_move(record)
+        return value
+
+    def cancel(self):
+        """ Stop a running search from another thread, until `cancelled` is cleared """
+
+        self.cancelled.set()
+
+    def iterative_deepening(
+        self,
+        board: Board,
+        max_player: bool,
+        budget_ms: int,
+        max_depth: int = 32
+    ) -> tuple[float, Play | None, int]:
+        """
+        Search one ply deeper at a time until `budget_ms` runs out and
+        return the value, move and depth of the last finished search.
+        The first ply is always finished so there is a move to play, unless
+        the search is cancelled.
+        """
+
+        with self._search() as stats:
+            deadline = time.perf_counter() + budget_ms / 1000
+            value, best_move, completed = self._evaluate(board), None, 0
+            self._pv = []
+            self.ordering.new_search()
+
+            for depth in range(1, max_depth + 1):
+                self._deadline = deadline if depth > 1 else None
+                self._stopped = False
+                self._root_depth = depth
+                self._follow_pv = True
+                nodes, start = self.nodes, time.perf_counter()
+
+                result = self._alpha_beta(
+                    board, depth, max_player, float('-inf'), float('inf')
+                )
+                if self._stopped:
+                    break
+
+                value, best_move = result
+                completed = depth
+                stats.depths.append(
+                    DepthStats(depth, value, self.nodes - nodes, time.perf_counter() - start)
+                )
+                self._pv = self._principal_variation(board, depth, max_player)
+                self.logger.info(f"Depth {depth} finished. Value: {value}")
+
+                if best_move is None or time.perf_counter() >= deadline:
+                    break
+
+            self._root_depth = completed
+            self._deadline = None
+            self._stopped = False
+        return value, self._play(board, best_move), completed
+
+    def _principal_variation(self, board: Board, depth: int, max_player: bool) -> list[Move]:
+        """ Follow the best moves stored in the transposition table """
+
+        pv: list[Move] = []
+        records = []
+        for _ in range(depth):
+            entry = self.table.get(board.hash ^ SIDE_KEYS[0 if max_player else 1])
+            color = Colors.RED if max_player else Colors.WHITE
+            if entry is None or entry.move not in self.get_all_moves(board, color):
+                break
+
+            pv.append(entry.move)
+            records.append(board.make_move(entry.move))
+            max_player = not max_player
+
+        for record in reversed(records):
+            board.undo_move(record)
+        return pv
+
+    def _ordered_moves(self, board: Board, color: ColorType, depth: int, hash_move: Move | None):
+        ply = self._root_depth - depth
+        side = 0 if color == Colors.RED else 1
+        moves = self.ordering.order(board, side, self.get_all_moves(board, color), ply)
+
+        # Along the previous iteration's principal variation its move goes first
+        first = hash_move
+        if self._follow_pv:
+            if ply < len(self._pv) and self._pv[ply] in moves:
+                first = self._pv[ply]
+            else:
+                self._follow_pv = False
+
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _tick(self) -> bool:
+        """ Count a node and tell whether the search has to stop """
+
+        self.nodes += 1
+        if self.nodes & 255 == 0 and (
+            self.cancelled.is_set()
+            or self._deadline is not None and time.perf_counter() >= self._deadline
+        ):
+            self._stopped = True
+        return self._stopped
+
+    def _quiescence(
+        self,
+        board: Board,
+        max_player: bool,
+        alpha: float,
+        beta: float,
+        ply: int
+    ) -> float:
+        """
+        Play out the captures left at the horizon so a position is only
+        evaluated once it is quiet. Capturing is mandatory, so the side to
+        move can only stand pat when it has no capture, and then that is
+        the value. Below `quiescence_depth` plies the static value is used.
+        """
+
+        if ply:
+            self.quiescence_nodes += 1
+            self.selective_depth = max(self.selective_depth, self._root_depth + ply)
+            if self._tick():
+                return 0.0
+
+        captures = board.get_captures(Colors.RED if max_player else Colors.WHITE) \
+            if ply < self.quiescence_depth else []
+        if not captures:
+            winner = board.check_winner()
+            if winner is not None:
+                return self._terminal_value(winner, self._root_depth + ply)
+            return self._evaluate(board)
+
+        captures.sort(key=lambda move: move.captured.bit_count(), reverse=True)
+        best_value = float('-inf') if max_player else float('inf')
+        for move in captures:
+            record = self.simulate_move(board, move)
+            value = self._quiescence(board, not max_player, alpha, beta, ply + 1)
+            board.undo_move(record)
+            if self._stopped:
+                return best_value
+
+            if max_player:
+                best_value = max(best_value, value)
+                alpha = max(alpha, best_value)
+            else:
+                best_value = min(best_value, value)
+                beta = min(beta, best_value)
+            if beta <= alpha:
+                break
+
+        return best_value
+
+    def _frontier(
+        self,
+        board: Board,
+        max_player: bool,
+        alpha: float,
+        beta: float,
+        hash_move: Move | None
+    ) -> tuple[float, Move | None]:
+        """
+        Depth 1 node searched with the batch evaluator: every child is
+        visited, the ones with captures pending go through quiescence and the
+        quiet ones are scored together in one call.
+        """
+
+        color, reply = (Colors.RED, Colors.WHITE) if max_player else (Colors.WHITE, Colors.RED)
+        moves = self._ordered_moves(board, color, 1, hash_move)
+        values = [0.0] * len(moves)
+        quiet: list[int] = []
+        positions = []
+
+        for index, move in enumerate(moves):
+            record = self.simulate_move(board, move)
+            if self._tick():
+                board.undo_move(record)
+                return (float('-inf') if max_player else float('inf')), None
+
+            if self.quiescence_depth and board.get_captures(reply):
+                values[index] = self._quiescence(board, not max_player, alpha, beta, 0)
+            elif board.check_winner() is not None:
+                # Cached by the check above
+                values[index] = self._terminal_value(board.check_winner(), self._root_depth)
+            else:
+                quiet.append(index)
+                positions.append(board.position())
+            board.undo_move(record)
+            self._follow_pv = False
+            if self._stopped:
+                return (float('-inf') if max_player else float('inf')), None
+
+        assert self.evaluator is not None
+        self._leaves += len(positions)
+        for index, value in zip(quiet, self.evaluator.evaluate_batch(positions)):
+            values[index] = float(value)
+
+        best_value = float('-inf') if max_player else float('inf')
+        best_move = None
+        for move, value in zip(moves, values):
+            if max_player:
+                best_value = max(best_value, value)
+            else:
+                best_value = min(best_value, value)
+            if best_value == value:
+                best_move = move
+        return best_value, best_move
+
+    def _alpha_beta(
+        self,
+        board: Board,
+        depth: int,
+        max_player: bool,
+        alpha: float,
+        beta: float
+    ) -> tuple[float, Move | None]:
+        if self._trace:
+            self.logger.log(TRACE, f"Alpha-beta search started. Depth: {depth}")
+        if self._tick():
+            return 0.0, None
+
+        # Below the root, where a move has to be found, the tablebase is exact
+        if self.tablebase is not None and depth < self._root_depth \
+                and board.red_left + board.white_left <= self.tablebase.pieces:
+            result = self.tablebase.probe(board.position(), 0 if max_player else 1)
+            if result is not None:
+                score = result.score(self._root_depth - depth)
+                return (score if max_player else -score), None
+
+        if depth == 0:
+            return self._quiescence(board, max_player, alpha, beta, 0), None
+
+        ply = self._root_depth - depth
+        winner = board.check_winner()
+        if winner is not None:
+            # Sooner wins score higher, as the tablebase's do
+            value = self._terminal_value(winner, ply)
+            if self._trace:
+                self.logger.log(TRACE, f"Value: {value}")
+            return value, None
+
+        key = board.hash ^ SIDE_KEYS[0 if max_player else 1]
+        entry = self.table.probe(key, ply)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth:
+                if entry.bound == Bound.EXACT:
+                    self.table.cutoffs += 1
+                    return entry.value, entry.move
+                if entry.bound == Bound.LOWER:
+                    alpha = max(alpha, entry.value)
+                else:
+                    beta = min(beta, entry.value)
+                if beta <= alpha:
+                    self.table.cutoffs += 1
+                    return entry.value, entry.move
+
+        alpha_start, beta_start = alpha, beta
+        index = -1
+        if depth == 1 and self.evaluator is not None:
+            best_value, best_move = self._frontier(board, max_player, alpha, beta, hash_move)
+            if self._stopped:
+                return best_value, best_move
+        elif max_player:
             best_value = float('-inf')
             best_move = None
-            for move in self.get_all_moves(board, Colors.RED):
-                value: float = self.alpha_beta(
-                    move, depth-1, False, alpha, beta
+            moves = self._ordered_moves(board, Colors.RED, depth, hash_move)
+            for index, move in enumerate(moves):
+                record = self.simulate_move(board, move)
+                value: float = self._alpha_beta(
+                    board, depth-1, False, alpha, beta
                 )[0]
+                board.undo_move(record)
+                self._follow_pv = False
+                if self._stopped:
+                    return best_value, best_move
+
                 best_value = max(best_value, value)
                 alpha = max(alpha, best_value)
                 if best_value == value:
                     best_move = move
 
                 if beta <= alpha:
+                    self.ordering.record_cutoff(move, self._root_depth - depth, depth, index)
                     break
-
-            return best_value, best_move
         else:
             best_value = float('inf')
             best_move = None
-            for move in self.get_all_moves(board, Colors.WHITE):
-                value = self.alpha_beta(
-                    move, depth-1, True, alpha, beta
+            moves = self._ordered_moves(board, Colors.WHITE, depth, hash_move)
+            for index, move in enumerate(moves):
+                record = self.simulate_move(board, move)
+                value = self._alpha_beta(
+                    board, depth-1, True, alpha, beta
                 )[0]
+                board.undo_move(record)
+                self._follow_pv = False
+                if self._stopped:
+                    return best_value, best_move
+
                 best_value = min(best_value, value)
                 beta = min(beta, best_value)
                 if best_value == value:
                     best_move = move
 
                 if beta <= alpha:
+                    self.ordering.record_cutoff(move, self._root_depth - depth, depth, index)
                     break
 
-            return best_value, best_move
+        if index >= 0:
+            self.ordering.record_node(index + 1)
+
+        if best_value <= alpha_start:
+            bound = Bound.UPPER
+        elif best_value >= beta_start:
+            bound = Bound.LOWER
+        else:
+            bound = Bound.EXACT
+        self.table.store(key, depth, bound, best_value, best_move, ply)
+
+        return best_value, best_move
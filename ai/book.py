@@ -0,0 +1,279 @@
+""" Opening book keyed by position hash, built offline and mapped on first use """
+import argparse
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterable, NamedTuple
+
+from ai.algorithm import Algorithm
+from checker.bitboard import Bitboard, Move, Play
+from checker.board import Board
+from checker.constants import Colors, ColorType, Dimensions
+from checker.zobrist import SIDE_KEYS, hash_bitboard
+
+
+MAGIC = b'CKOB'
+VERSION = 1
+DEFAULT_PATH = 'opening.book'
+
+# magic, version, rows, cols, hash of the start position, number of records
+HEADER = struct.Struct('<4sHBBQI')
+# key, source, target, variant, weight, score in hundredths of a piece
+RECORD = struct.Struct('<QBBBxHh')
+
+
+def book_key(board: Board, side: int) -> int:
+    """ Position hash with the side to move, as the transposition table keys it """
+
+    return board.hash ^ SIDE_KEYS[side]
+
+
+def _start_hash() -> int:
+    """ Changes whenever the Zobrist keys or the board size do, which voids a book """
+
+    return hash_bitboard(Bitboard.initial())
+
+
+class BookMove(NamedTuple):
+    move: Move
+    weight: int
+    # Value for the side to move, in pieces
+    score: float
+
+
+def _variant(board: Board, move: Move) -> int:
+    """ Which of the legal moves sharing `move`'s squares it is, for capture chains """
+
+    side = board.bitboard.side_at(move.source)
+    same = sorted(
+        candidate.captured for candidate in board.bitboard.moves(side)
+        if candidate.source == move.source and candidate.target == move.target
+    )
+    return same.index(move.captured)
+
+
+class OpeningBook:
+    """
+    Fixed size records sorted by key in a memory-mapped file. Nothing is
+    read until the first lookup, and a lookup is a binary search, so opening
+    a book costs the same whatever its size.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._data: mmap.mmap | None = None
+        self._count = 0
+        self._rejected = False
+        self.hits = self.misses = 0
+
+    def _open(self) -> bool:
+        if self._data is not None:
+            return True
+        if self._rejected or not os.path.exists(self.path):
+            return False
+
+        with open(self.path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rows, cols, start, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION \
+                or (rows, cols) != (Dimensions.ROW, Dimensions.COL) \
+                or start != _start_hash():
+            self.logger.warning(f"{self.path} does not match this board, ignoring it")
+            data.close()
+            self._rejected = True
+            return False
+
+        self._data, self._count = data, count
+        return True
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+    def _key_at(self, position: int) -> int:
+        assert self._data is not None
+        return struct.unpack_from('<Q', self._data, HEADER.size + position * RECORD.size)[0]
+
+    def moves(self, board: Board, color: ColorType) -> list[BookMove]:
+        """ Book moves of `color` in `board`, legal ones only """
+
+        if not self._open():
+            return []
+        assert self._data is not None
+
+        side = 0 if color == Colors.RED else 1
+        key = book_key(board, side)
+
+        # First record with the key
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        legal = board.get_moves(color)
+        found = []
+        for position in range(low, self._count):
+            record_key, source, target, variant, weight, score = \
+                RECORD.unpack_from(self._data, HEADER.size + position * RECORD.size)
+            if record_key != key:
+                break
+
+            same = sorted(
+                move.captured for move in legal
+                if move.source == source and move.target == target
+            )
+            if variant < len(same):
+                found.append(
+                    BookMove(Move(source, target, same[variant]), weight, score / 100)
+                )
+
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def choose(
+        self,
+        board: Board,
+        color: ColorType,
+        rng: random.Random | None = None
+    ) -> Play | None:
+        """ A book move picked in proportion to its weight, None out of book """
+
+        moves = [move for move in self.moves(board, color) if move.weight]
+        if not moves:
+            return None
+
+        chosen = (rng or random).choices(moves, weights=[move.weight for move in moves])[0]
+        return board.describe(chosen.move)
+
+
+@dataclass
+class _Entry:
+    weight: int = 0
+    score: float = 0.0
+
+
+class BookBuilder:
+    """ Gathers weighted moves per position and writes them as a book """
+
+    def __init__(self):
+        self.entries: dict[tuple[int, int, int, int], _Entry] = defaultdict(_Entry)
+
+    def add(self, board: Board, move: Move, weight: int, score: float):
+        """ `score` is for the side to move; later adds average in by weight """
+
+        side = board.bitboard.side_at(move.source)
+        entry = self.entries[(
+            book_key(board, side), move.source, move.target, _variant(board, move)
+        )]
+        total = entry.weight + weight
+        entry.score = (entry.score * entry.weight + score * weight) / total if total else score
+        entry.weight = total
+
+    def add_game(self, moves: Iterable[Move], result: int, plies: int):
+        """ The first `plies` moves of a game white started, `result` 1 red won, -1 white """
+
+        board = Board()
+        for ply, move in enumerate(moves):
+            if ply >= plies:
+                break
+            side = board.bitboard.side_at(move.source)
+            self.add(board, move, 1, result if side == 0 else -result)
+            board.make_move(move)
+
+    def add_search(self, depth: int, plies: int, width: int, algorithm: Algorithm | None = None):
+        """
+        Search every move of the start position and its best replies to
+        `depth`, keeping the `width` best moves per position for `plies` plies.
+        """
+
+        algorithm = algorithm or Algorithm()
+        self._expand(algorithm, Board(), False, depth, plies, width)
+
+    def _expand(
+        self,
+        algorithm: Algorithm,
+        board: Board,
+        max_player: bool,
+        depth: int,
+        plies: int,
+        width: int
+    ):
+        if plies == 0 or board.check_winner() is not None:
+            return
+
+        color = Colors.RED if max_player else Colors.WHITE
+        scored = []
+        for move in board.get_moves(color):
+            value = algorithm.search_move(board, move, depth, max_player)
+            scored.append((value if max_player else -value, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        # The best move weighs `width`, the next one less and so on
+        for rank, (score, move) in enumerate(scored[:width]):
+            self.add(board, move, width - rank, score)
+            record = board.make_move(move)
+            self._expand(algorithm, board, not max_player, depth, plies - 1, width)
+            board.undo_move(record)
+
+    def write(self, path: str):
+        records = sorted(
+            (key, source, target, variant, -entry.weight, entry.score)
+            for (key, source, target, variant), entry in self.entries.items()
+        )
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(
+                MAGIC, VERSION, Dimensions.ROW, Dimensions.COL, _start_hash(), len(records)
+            ))
+            for key, source, target, variant, weight, score in records:
+                file.write(RECORD.pack(
+                    key, source, target, variant,
+                    min(-weight, 0xFFFF), max(-0x8000, min(0x7FFF, round(score * 100)))
+                ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build an opening book')
+    parser.add_argument('--output', default=DEFAULT_PATH)
+    parser.add_argument('--plies', type=int, default=6, help='depth of the book in moves')
+    parser.add_argument(
+        '--selfplay',
+        help='JSONL written by ai.selfplay to count moves from, instead of searching'
+    )
+    parser.add_argument('--depth', type=int, default=6, help='search depth per book move')
+    parser.add_argument('--width', type=int, default=2, help='moves kept per position')
+    args = parser.parse_args()
+
+    builder = BookBuilder()
+    if args.selfplay:
+        results = {'red': 1, 'white': -1, 'draw': 0}
+        with open(args.selfplay, encoding='utf-8') as file:
+            for line in file:
+                game = json.loads(line)
+                builder.add_game(
+                    (Move(*move) for move in game['moves']),
+                    results[game['winner']],
+                    args.plies
+                )
+    else:
+        builder.add_search(args.depth, args.plies, args.width)
+
+    builder.write(args.output)
+    print(f"Wrote {len(builder.entries)} moves to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+""" Vectorised evaluation of many positions at once with NumPy """
+from dataclasses import astuple, dataclass, fields
+from typing import Sequence
+
+import numpy as np
+
+from checker.bitboard import Position
+from checker.board import MOBILITY_WEIGHT, Board
+from checker.constants import Dimensions
+from checker.geometry import ALL_DIRECTIONS, FORWARD, PLAYABLE, SQUARES, STEP_SOURCES, STEPS
+
+
+# Bytes needed for one square mask
+MASK_BYTES = (SQUARES + 7) // 8
+
+
+@dataclass
+class Weights:
+    """
+    One weight per feature, each feature being red's count minus white's.
+    The defaults count material and simple moves, which gives the same
+    scores as `Board.evaluate`.
+    """
+
+    # Every piece, kings included
+    material: float = 1.0
+    # Extra value of a king
+    king: float = 0.5
+    # How far the men have come, 0 on the home row and 1 just before crowning
+    advancement: float = 0.0
+    # Men still guarding the home row against promotions
+    back_rank: float = 0.0
+    # Pieces on the central half of the board
+    centre: float = 0.0
+    # Simple moves available to each side
+    mobility: float = MOBILITY_WEIGHT
+
+    def vector(self) -> np.ndarray:
+        return np.array(astuple(self), dtype=np.float64)
+
+    @classmethod
+    def from_vector(cls, vector: Sequence[float]) -> 'Weights':
+        return cls(*(float(value) for value in vector))
+
+
+FEATURES = tuple(field.name for field in fields(Weights))
+
+
+def encode(positions: Sequence[Position]) -> np.ndarray:
+    """ Positions as an N x 4 x SQUARES array of 0/1 planes in `Position` order """
+
+    data = b''.join(
+        mask.to_bytes(MASK_BYTES, 'little')
+        for position in positions for mask in position
+    )
+    bits = np.unpackbits(
+        np.frombuffer(data, dtype=np.uint8).reshape(len(positions), 4, MASK_BYTES),
+        axis=2, bitorder='little'
+    )
+    return bits[:, :, :SQUARES]
+
+
+def _square_vector(predicate) -> np.ndarray:
+    return np.array([
+        float(predicate(*divmod(square, Dimensions.COL))) if PLAYABLE >> square & 1 else 0.0
+        for square in range(SQUARES)
+    ])
+
+
+class Evaluator:
+    """
+    Scores a batch of positions from red's side with one matrix product for
+    the features that are linear in the piece planes, plus mobility. The
+    features of a batch can be taken on their own for offline tuning.
+    """
+
+    def __init__(self, weights: Weights | None = None):
+        self.weights = weights if weights is not None else Weights()
+
+        last = Dimensions.ROW - 1
+        low, high = Dimensions.ROW // 4, Dimensions.ROW - Dimensions.ROW // 4
+        ones = _square_vector(lambda row, col: True)
+        centre = _square_vector(lambda row, col: low <= row < high and low <= col < high)
+
+        # [plane, square, feature] in Position plane order
+        linear = np.zeros((4, SQUARES, len(FEATURES)))
+        sign = (1.0, -1.0, 1.0, -1.0)
+        for plane in range(4):
+            linear[plane, :, FEATURES.index('material')] = sign[plane] * ones
+            linear[plane, :, FEATURES.index('centre')] = sign[plane] * centre
+        linear[2, :, FEATURES.index('king')] = ones
+        linear[3, :, FEATURES.index('king')] = -ones
+        # A man one row from crowning has come `last - 1` rows, as men never stand on it
+        linear[0, :, FEATURES.index('advancement')] = \
+            _square_vector(lambda row, col: row / (last - 1))
+        linear[1, :, FEATURES.index('advancement')] = \
+            -_square_vector(lambda row, col: (last - row) / (last - 1))
+        linear[0, :, FEATURES.index('back_rank')] = _square_vector(lambda row, col: row == 0)
+        linear[1, :, FEATURES.index('back_rank')] = -_square_vector(lambda row, col: row == last)
+        self._linear = linear.reshape(4 * SQUARES, len(FEATURES)).astype(np.float32)
+        self._mobility = FEATURES.index('mobility')
+
+        # Squares a step in each direction can start from
+        self._step_sources = [
+            np.array(
+                [STEP_SOURCES[direction] >> square & 1 for square in range(SQUARES)],
+                dtype=np.uint8
+            )
+            for direction in ALL_DIRECTIONS
+        ]
+        self._playable = ones.astype(np.uint8)
+
+    def features(self, positions: Sequence[Position] | np.ndarray) -> np.ndarray:
+        """ N x len(FEATURES) feature matrix of positions or of `encode`d planes """
+
+        planes = positions if isinstance(positions, np.ndarray) else encode(positions)
+        planes = planes.reshape(len(planes), 4, SQUARES)
+
+        features = planes.reshape(len(planes), 4 * SQUARES) @ self._linear
+
+        empty = self._playable - planes.sum(axis=1, dtype=np.uint8)
+        features[:, self._mobility] = \
+            self._moves(planes, empty, 0) - self._moves(planes, empty, 1)
+        return features
+
+    def _moves(self, planes: np.ndarray, empty: np.ndarray, side: int) -> np.ndarray:
+        """ Simple moves of one side, one slice of the planes per direction """
+
+        men, kings = planes[:, side], planes[:, side + 2]
+        moves = np.zeros(len(planes), dtype=np.int64)
+        for direction in ALL_DIRECTIONS:
+            step = STEPS[direction]
+            movers = (men | kings if direction in FORWARD[side] else kings) \
+                & self._step_sources[direction]
+            if step > 0:
+                landed = movers[:, :SQUARES - step] & empty[:, step:]
+            else:
+                landed = movers[:, -step:] & empty[:, :SQUARES + step]
+            moves += landed.sum(axis=1, dtype=np.int64)
+        return moves
+
+    def evaluate_batch(self, positions: Sequence[Position] | np.ndarray) -> np.ndarray:
+        """ Scores of every position, red's side as in `Board.evaluate` """
+
+        if len(positions) == 0:
+            return np.zeros(0)
+        return self.features(positions).astype(np.float64) @ self.weights.vector()
+
+    def evaluate(self, board: Board) -> float:
+        return float(self.evaluate_batch([board.position()])[0])
@@ -0,0 +1,95 @@
+""" Move ordering between move generation and the alpha-beta search """
+from checker.bitboard import Move
+from checker.board import Board
+from checker.geometry import PROMOTION, SQUARES
+
+
+MAX_PLY = 128
+
+
+class MoveOrdering:
+    """
+    Sorts moves by captured pieces, promotion, killer moves of the ply and
+    the history score of their from/to squares. Each heuristic can be
+    turned off, and the statistics show how often the first move searched
+    was the one that cut off.
+    """
+
+    def __init__(self, captures: bool = True, killers: bool = True, history: bool = True):
+        self.captures = captures
+        self.killers = killers
+        self.history = history
+
+        self._killers: list[list[Move | None]] = [[None, None] for _ in range(MAX_PLY)]
+        self._history = [0] * (SQUARES * SQUARES)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.nodes = self.moves_searched = 0
+        self.cutoffs = self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """ Forget the killers and age the history before a new root search """
+
+        self._killers = [[None, None] for _ in range(MAX_PLY)]
+        self._history = [score >> 1 for score in self._history]
+
+    def order(self, board: Board, side: int, moves: list[Move], ply: int) -> list[Move]:
+        if not (self.captures or self.killers or self.history):
+            return moves
+
+        kings = board.bitboard.kings[side]
+        promotion = PROMOTION[side]
+        killers = self._killers[ply] if self.killers and ply < MAX_PLY else (None, None)
+
+        def score(move: Move) -> tuple[int, int, int, int]:
+            captured = promoted = killer = history = 0
+            if self.captures:
+                captured = move.captured.bit_count()
+                promoted = int(
+                    not kings >> move.source & 1 and promotion >> move.target & 1
+                )
+            if move == killers[0]:
+                killer = 2
+            elif move == killers[1]:
+                killer = 1
+            if self.history:
+                history = self._history[move.source * SQUARES + move.target]
+            return captured, promoted, killer, history
+
+        return sorted(moves, key=score, reverse=True)
+
+    def record_node(self, searched: int):
+        self.nodes += 1
+        self.moves_searched += searched
+
+    def record_cutoff(self, move: Move, ply: int, depth: int, index: int):
+        """ `move` was the `index`th move searched and failed high """
+
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        # Captures are ordered by themselves, killers and history are for quiet moves
+        if move.captured:
+            return
+
+        if self.killers and ply < MAX_PLY:
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        if self.history:
+            self._history[move.source * SQUARES + move.target] += depth * depth
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            'nodes': self.nodes,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'first_move_cutoff_rate':
+                self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            'moves_per_node':
+                self.moves_searched / self.nodes if self.nodes else 0.0,
+        }
@@ -0,0 +1,165 @@
+""" Root-split alpha-beta search over a process pool """
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from ai.algorithm import Algorithm
+from ai.pool import init_worker, worker_algorithm
+from checker.bitboard import Move, Play, Position
+from checker.board import Board
+from checker.constants import Colors
+
+
+def _search_root_move(
+    position: Position,
+    move: Move,
+    depth: int,
+    max_player: bool,
+    alpha: float,
+    beta: float
+) -> tuple[Move, float, int]:
+    algorithm = worker_algorithm()
+    board = Board.from_position(position)
+    nodes = algorithm.nodes
+    value = algorithm.search_move(board, move, depth, max_player, alpha, beta)
+    return move, value, algorithm.nodes - nodes
+
+
+@dataclass
+class ParallelResult:
+    value: float
+    move: Play | None
+    nodes: int
+    elapsed: float
+    workers: int
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+
+class ParallelSearch:
+    """
+    Searches the first root move on its own, then hands the remaining root
+    moves to the pool with the bound it produced (Young Brothers Wait at the
+    root). Workers only receive a `Position` and a `Move`.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.logger = logging.getLogger(__name__)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> 'ParallelSearch':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_worker
+            )
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def search(self, board: Board, depth: int, max_player: bool) -> ParallelResult:
+        start = time.perf_counter()
+        color = Colors.RED if max_player else Colors.WHITE
+        moves = board.get_moves(color)
+        if depth == 0 or not moves:
+            return ParallelResult(board.evaluate(), None, 1, time.perf_counter() - start, self.workers)
+
+        position = board.position()
+
+        best_move, best_value, nodes = self.executor.submit(
+            _search_root_move, position, moves[0], depth, max_player,
+            float('-inf'), float('inf')
+        ).result()
+
+        alpha, beta = (best_value, float('inf')) if max_player \
+            else (float('-inf'), best_value)
+        futures = [
+            self.executor.submit(
+                _search_root_move, position, move, depth, max_player, alpha, beta
+            )
+            for move in moves[1:]
+        ]
+
+        for future in futures:
+            move, value, searched = future.result()
+            nodes += searched
+            if value > best_value if max_player else value < best_value:
+                best_value, best_move = value, move
+
+        elapsed = time.perf_counter() - start
+        self.logger.info(
+            f"Parallel search depth {depth}: {nodes} nodes in {elapsed:.3f}s "
+            f"with {self.workers} workers"
+        )
+        return ParallelResult(
+            best_value, board.describe(best_move), nodes, elapsed, self.workers
+        )
+
+
+def scaling(board: Board, depth: int, max_player: bool, max_workers: int) -> list[dict]:
+    """ Serial alpha_beta against the parallel search for 1..max_workers processes """
+
+    algorithm = Algorithm()
+    start = time.perf_counter()
+    value, _ = algorithm.alpha_beta(
+        board, depth, max_player, float('-inf'), float('inf')
+    )
+    serial = time.perf_counter() - start
+
+    rows = [{
+        'workers': 0,
+        'value': value,
+        'nodes': algorithm.nodes,
+        'seconds': serial,
+        'nodes_per_second': algorithm.nodes / serial if serial else 0.0,
+        'speedup': 1.0,
+    }]
+    for workers in range(1, max_workers + 1):
+        with ParallelSearch(workers) as search:
+            search.executor.submit(init_worker).result()
+            result = search.search(board, depth, max_player)
+        rows.append({
+            'workers': workers,
+            'value': result.value,
+            'nodes': result.nodes,
+            'seconds': result.elapsed,
+            'nodes_per_second': result.nodes_per_second,
+            'speedup': serial / result.elapsed if result.elapsed else 0.0,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare the parallel root-split search with serial alpha_beta'
+    )
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'nodes':>10} {'seconds':>9} {'nodes/s':>10} {'speedup':>8}")
+    for row in scaling(Board(), args.depth, True, args.workers):
+        workers = row['workers'] or 'serial'
+        print(
+            f"{workers:>8} {row['nodes']:>10} {row['seconds']:>9.3f} "
+            f"{row['nodes_per_second']:>10.0f} {row['speedup']:>8.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
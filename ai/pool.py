@@ -0,0 +1,32 @@
+""" Per-process search state shared by the process pools of the AI """
+from ai.algorithm import Algorithm
+from ai.tablebase import Tablebase, open_default
+
+
+# Opened once per worker process, so the mapped file and the transposition
+# table outlive a task
+_tablebase: Tablebase | None = None
+_algorithm: Algorithm | None = None
+_initialized = False
+
+
+def init_worker():
+    """ `ProcessPoolExecutor` initializer, also run lazily outside a pool """
+
+    global _tablebase, _algorithm, _initialized
+    if _initialized:
+        return
+    _tablebase = open_default()
+    _algorithm = Algorithm(tablebase=_tablebase)
+    _initialized = True
+
+
+def worker_tablebase() -> Tablebase | None:
+    init_worker()
+    return _tablebase
+
+
+def worker_algorithm() -> Algorithm:
+    init_worker()
+    assert _algorithm is not None
+    return _algorithm
@@ -0,0 +1,68 @@
+""" Profiler hooks for `Algorithm.profile_next`, and a CLI profiling one search """
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+from contextlib import contextmanager
+from typing import Iterator
+
+from ai.algorithm import Algorithm
+from checker.bitboard import Position
+from checker.board import Board
+
+
+@contextmanager
+def cprofile(path: str | None = None, limit: int = 25) -> Iterator[cProfile.Profile]:
+    """ Profile the block, dumping to `path` for pstats/snakeviz or printing the top entries """
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        else:
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile one alpha-beta search')
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument(
+        '--budget-ms', type=int, default=None,
+        help='iterative deepening with this budget instead of a fixed depth'
+    )
+    parser.add_argument(
+        '--position',
+        help='red men, white men, red kings and white kings masks as hex, comma separated'
+    )
+    parser.add_argument('--side', choices=('red', 'white'), default='white')
+    parser.add_argument('--output', help='write the cProfile data here instead of printing it')
+    parser.add_argument('--no-profile', action='store_true', help='only print the statistics')
+    args = parser.parse_args()
+
+    if args.position:
+        board = Board.from_position(
+            Position(*(int(mask, 16) for mask in args.position.split(',')))
+        )
+    else:
+        board = Board()
+    max_player = args.side == 'red'
+
+    algorithm = Algorithm()
+    if not args.no_profile:
+        algorithm.profile_next(cprofile(args.output))
+
+    if args.budget_ms is not None:
+        algorithm.iterative_deepening(board, max_player, args.budget_ms)
+    else:
+        algorithm.alpha_beta(board, args.depth, max_player, float('-inf'), float('inf'))
+
+    print(json.dumps(algorithm.stats.as_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+""" Offline retrograde analysis that writes endgame tablebases """
+import argparse
+import logging
+import time
+from itertools import combinations
+
+import numpy as np
+
+from ai.tablebase import (
+    DEFAULT_PATH, DRAW, ENTRY, HEADER, LOSS, MAGIC, MAX_DISTANCE, UNUSED,
+    VERSION, Material, Outcome, Result, decode, index, locate)
+from checker.bitboard import RED, WHITE, Bitboard, Position
+from checker.constants import Dimensions
+from checker.geometry import DARK, PROMOTION
+
+
+# Solving state of each position
+UNSOLVED, WON, LOST = 0, 1, 2
+
+
+def materials(pieces: int) -> list[Material]:
+    """
+    Stored materials of at most `pieces` pieces, in an order where every
+    capture or promotion leads to a material solved before.
+    """
+
+    found = []
+    for total in range(2, pieces + 1):
+        for red_men in range(total + 1):
+            for white_men in range(total - red_men + 1):
+                for red_kings in range(total - red_men - white_men + 1):
+                    material = Material(
+                        red_men, white_men, red_kings,
+                        total - red_men - white_men - red_kings
+                    )
+                    if material.red_men + material.red_kings \
+                            and material.white_men + material.white_kings \
+                            and material.canonical:
+                        found.append(material)
+
+    # Captures lower the total and promotions the number of men
+    return sorted(found, key=lambda material: (
+        material.pieces, material.red_men + material.white_men
+    ))
+
+
+def placements(material: Material):
+    """ Every legal position of a material, men never standing on their crowning row """
+
+    men_squares = (
+        [square for square in DARK if not PROMOTION[RED] >> square & 1],
+        [square for square in DARK if not PROMOTION[WHITE] >> square & 1],
+    )
+    allowed = (men_squares[RED], men_squares[WHITE], DARK, DARK)
+
+    def place(group: int, occupied: int, masks: list[int]):
+        if group == 4:
+            yield Position(*masks)
+            return
+
+        for chosen in combinations(allowed[group], material[group]):
+            mask = sum(1 << square for square in chosen)
+            if not mask & occupied:
+                yield from place(group + 1, occupied | mask, masks + [mask])
+
+    yield from place(0, 0, [])
+
+
+class Generator:
+    """ Solves materials one after another, each from the ones before it """
+
+    def __init__(self):
+        self.tables: dict[Material, np.ndarray] = {}
+        self.logger = logging.getLogger(__name__)
+
+    def lookup(self, position: Position, side: int) -> Result:
+        located = locate(position, side)
+        if located is None:
+            # The side to move has just lost its last piece
+            return Result(Outcome.LOSS, 0)
+
+        material, side, position_index = located
+        result = decode(int(self.tables[material][side * material.size + position_index]))
+        assert result is not None, f"{position} is not in the {material} table"
+        return result
+
+    def solve(self, material: Material) -> np.ndarray:
+        """ One byte per (side to move, index) of `material`, see `ai.tablebase` """
+
+        start = time.perf_counter()
+        size = material.size
+        count = 2 * size
+
+        valid = np.zeros(count, dtype=bool)
+        has_moves = np.zeros(count, dtype=bool)
+        # Best external result: children in other, already solved materials
+        external_win = np.full(count, np.iinfo(np.int32).max, dtype=np.int32)
+        external_loss = np.full(count, -1, dtype=np.int32)
+        external_other = np.zeros(count, dtype=bool)
+        sources: list[int] = []
+        targets: list[int] = []
+
+        for position in placements(material):
+            position_index = index(material, position)
+            for side in (RED, WHITE):
+                node = side * size + position_index
+                valid[node] = True
+
+                bitboard = Bitboard.from_position(position)
+                for move in bitboard.moves(side):
+                    has_moves[node] = True
+                    undo = bitboard.apply(move)
+                    child = bitboard.position()
+                    bitboard.undo(undo)
+
+                    if Material.of(child) == material:
+                        sources.append(node)
+                        targets.append((1 - side) * size + index(material, child))
+                        continue
+
+                    result = self.lookup(child, 1 - side)
+                    if result.outcome == Outcome.LOSS:
+                        external_win[node] = min(external_win[node], result.distance)
+                    elif result.outcome == Outcome.WIN:
+                        external_loss[node] = max(external_loss[node], result.distance)
+                    else:
+                        external_other[node] = True
+
+        edge_sources = np.array(sources, dtype=np.int64)
+        edge_targets = np.array(targets, dtype=np.int64)
+        degree = np.bincount(edge_sources, minlength=count)
+
+        outcome = np.full(count, UNSOLVED, dtype=np.uint8)
+        distance = np.zeros(count, dtype=np.int32)
+        outcome[valid & ~has_moves] = LOST
+
+        # Round k settles the positions won or lost in exactly k plies
+        no_win = np.iinfo(np.int32).max
+        last_external = max(
+            int(external_loss.max(initial=0)),
+            int(external_win[external_win != no_win].max(initial=0))
+        )
+        ply = 0
+        while True:
+            ply += 1
+            unknown = valid & (outcome == UNSOLVED)
+
+            child_outcome = outcome[edge_targets]
+            lost_child = np.bincount(
+                edge_sources,
+                weights=(child_outcome == LOST) & (distance[edge_targets] == ply - 1),
+                minlength=count
+            ) > 0
+            won_children = np.bincount(
+                edge_sources, weights=child_outcome == WON, minlength=count
+            )
+
+            wins = unknown & ((external_win == ply - 1) | lost_child)
+            losses = unknown & ~wins & ~external_other & (external_win == no_win) \
+                & (won_children == degree) & (external_loss < ply)
+
+            outcome[wins] = WON
+            outcome[losses] = LOST
+            distance[wins | losses] = ply
+
+            if not wins.any() and not losses.any() and ply > last_external + 1:
+                break
+
+        # Same bytes as `ai.tablebase.encode`, for the whole table at once
+        table = np.full(count, UNUSED, dtype=np.uint8)
+        table[valid & (outcome == UNSOLVED)] = DRAW
+        won, lost = outcome == WON, outcome == LOST
+        table[won] = np.minimum(distance[won], MAX_DISTANCE + 1)
+        table[lost] = LOSS + np.minimum(distance[lost], MAX_DISTANCE)
+
+        self.logger.info(
+            f"{material}: {int(valid.sum())} positions, {len(sources)} moves, "
+            f"{ply} rounds in {time.perf_counter() - start:.1f}s"
+        )
+        self.tables[material] = table
+        return table
+
+    def generate(self, pieces: int) -> dict[Material, np.ndarray]:
+        for material in materials(pieces):
+            if material not in self.tables:
+                self.solve(material)
+        return self.tables
+
+    def write(self, path: str, pieces: int):
+        """ Header, one directory entry per material, then the tables """
+
+        order = list(self.tables)
+        offset = HEADER.size + ENTRY.size * len(order)
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(
+                MAGIC, VERSION, Dimensions.ROW, Dimensions.COL, pieces, len(order)
+            ))
+            for material in order:
+                file.write(ENTRY.pack(*material, offset, material.size))
+                offset += 2 * material.size
+            for material in order:
+                file.write(self.tables[material].tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate endgame tablebases')
+    parser.add_argument(
+        '--pieces', type=int, default=3,
+        help='most pieces on the board, 4 takes hours in pure Python'
+    )
+    parser.add_argument('--output', default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    generator = Generator()
+    start = time.perf_counter()
+    for material in materials(args.pieces):
+        generator.solve(material)
+        print(f"{str(tuple(material)):>14} {time.perf_counter() - start:>9.1f}s")
+    generator.write(args.output, args.pieces)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+""" Headless AI-vs-AI self-play over a process pool, streamed to JSONL """
+import argparse
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from ai.algorithm import Algorithm
+from ai.pool import init_worker, worker_tablebase
+from checker.archive import GameWriter
+from checker.bitboard import Move
+from checker.board import Board
+from checker.constants import Colors
+from checker.notation import WINNERS, GameRecord, winner_name
+
+
+def play_game(
+    game: int,
+    depth: int = 3,
+    budget_ms: int | None = None,
+    max_plies: int = 300,
+    random_plies: int = 4,
+    seed: int = 0,
+    quiescence_depth: int = 8
+) -> dict:
+    """
+    Play one game from the starting position, white moving first as in
+    `Game`. The first `random_plies` moves are random, seeded by `seed` and
+    the game number, so games differ from each other but can be replayed.
+    """
+
+    rng = random.Random(seed * 1_000_003 + game)
+    # A fresh algorithm per game keeps games replayable, the tablebase is the worker's
+    algorithm = Algorithm(quiescence_depth=quiescence_depth, tablebase=worker_tablebase())
+    board = Board()
+    max_player = False
+
+    move_times: list[float] = []
+    played: list[list[int]] = []
+    nodes = 0
+    winner = None
+    reason = "max-plies"
+    start = time.perf_counter()
+
+    for ply in range(max_plies):
+        winner = winner_name(board.check_winner())
+        if winner is not None:
+            reason = "game-over"
+            break
+
+        color = Colors.RED if max_player else Colors.WHITE
+        moves = board.get_moves(color)
+        if not moves:
+            winner = "white" if max_player else "red"
+            reason = "no-moves"
+            break
+
+        move_start = time.perf_counter()
+        searched = algorithm.nodes
+        if ply < random_plies:
+            move = rng.choice(moves)
+        else:
+            if budget_ms is not None:
+                _, play, _ = algorithm.iterative_deepening(board, max_player, budget_ms)
+            else:
+                _, play = algorithm.alpha_beta(
+                    board, depth, max_player, float('-inf'), float('inf')
+                )
+            if play is None:
+                break
+            move = play.move()
+        board.make_move(move)
+        played.append(list(move))
+        move_times.append(time.perf_counter() - move_start)
+        nodes += algorithm.nodes - searched
+
+        max_player = not max_player
+    else:
+        winner = winner_name(board.check_winner()) or "draw"
+
+    return {
+        "game": game,
+        "winner": winner or "draw",
+        "reason": reason,
+        "plies": len(move_times),
+        "nodes": nodes,
+        "seconds": time.perf_counter() - start,
+        "move_times": move_times,
+        # (source, target, captured mask) per ply, for building opening books
+        "moves": played,
+    }
+
+
+def run(
+    games: int,
+    output: str,
+    workers: int | None = None,
+    archive: str | None = None,
+    **options
+) -> dict[str, int]:
+    """
+    Play `games` games across a process pool, writing each as it finishes,
+    and appending its moves to the binary `archive` if one is given
+    """
+
+    logger = logging.getLogger(__name__)
+    totals = {"red": 0, "white": 0, "draw": 0}
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker) as executor, \
+            open(output, 'a', encoding='utf-8') as file, \
+            (GameWriter(archive) if archive else nullcontext()) as writer:
+        futures = [
+            executor.submit(play_game, game, **options)
+            for game in range(games)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            totals[result["winner"]] += 1
+
+            file.write(json.dumps(result) + '\n')
+            file.flush()
+            if writer is not None:
+                writer.write(GameRecord(
+                    tuple(Move(*move) for move in result["moves"]),
+                    result["winner"] if result["winner"] in WINNERS else None
+                ))
+            logger.info(
+                f"Game {result['game']} finished: {result['winner']} "
+                f"in {result['plies']} plies"
+            )
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play AI-vs-AI games headlessly')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--output', default='selfplay.jsonl')
+    parser.add_argument('--archive', help='also append the games to this binary archive')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument(
+        '--budget-ms', type=int, default=None,
+        help='time per move for iterative deepening instead of a fixed depth'
+    )
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--random-plies', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--quiescence-depth', type=int, default=8,
+        help='capture-only plies searched past the horizon, 0 to turn off'
+    )
+    args = parser.parse_args()
+
+    totals = run(
+        args.games,
+        args.output,
+        args.workers,
+        args.archive,
+        depth=args.depth,
+        budget_ms=args.budget_ms,
+        max_plies=args.max_plies,
+        random_plies=args.random_plies,
+        seed=args.seed,
+        quiescence_depth=args.quiescence_depth
+    )
+    print(json.dumps(totals))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+""" Statistics of one search, gathered from counters the search keeps anyway """
+import logging
+from dataclasses import asdict, dataclass, field
+
+
+# Below DEBUG, so the DEBUG handlers of logging.yml do not turn on per-node lines
+TRACE = 5
+logging.addLevelName(TRACE, 'TRACE')
+
+
+@dataclass
+class DepthStats:
+    """ One finished iteration of iterative deepening """
+
+    depth: int
+    value: float
+    nodes: int
+    seconds: float
+
+
+@dataclass
+class SearchStats:
+    nodes: int = 0
+    # Positions scored by the evaluation
+    leaves: int = 0
+    cutoffs: int = 0
+    tt_hits: int = 0
+    tt_cutoffs: int = 0
+    quiescence_nodes: int = 0
+    tablebase_hits: int = 0
+    # Deepest ply reached, quiescence included
+    max_depth: int = 0
+    seconds: float = 0.0
+    depths: list[DepthStats] = field(default_factory=list)
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats['nodes_per_second'] = self.nodes_per_second
+        return stats
+
+    def summary(self) -> str:
+        return (
+            f"{self.nodes} nodes ({self.leaves} leaves, {self.quiescence_nodes} quiescence) "
+            f"in {self.seconds:.3f}s, {self.nodes_per_second:.0f} nodes/s, "
+            f"{self.cutoffs} cutoffs, {self.tt_hits} TT hits, "
+            f"{self.tablebase_hits} tablebase hits, max depth {self.max_depth}"
+        )
@@ -0,0 +1,212 @@
+""" Endgame tablebase file format and a memory-mapped probe """
+import mmap
+import os
+import struct
+from enum import IntEnum
+from math import comb
+from typing import NamedTuple
+
+from checker.bitboard import Position, squares
+from checker.constants import Dimensions
+from checker.geometry import DARK, ORDINAL, SQUARES
+
+
+MAGIC = b'CKTB'
+VERSION = 1
+DEFAULT_PATH = 'endgame.tb'
+
+# magic, version, rows, cols, most pieces, number of materials
+HEADER = struct.Struct('<4sHBBBxI')
+# red men, white men, red kings, white kings, offset, entries per side
+ENTRY = struct.Struct('<BBBBQQ')
+
+# One byte per position: 0 draw, 1..127 win in that many plies,
+# 128..254 loss in (byte - 128) plies, 255 not a legal position
+DRAW = 0
+LOSS = 128
+UNUSED = 255
+MAX_DISTANCE = 126
+
+# Score of a won position before the distance is taken off, above any material
+WIN_VALUE = 1000.0
+# Scores past this are wins and losses counted in plies, however long the line
+WIN_THRESHOLD = WIN_VALUE / 2
+
+_COMB = [[comb(n, k) for k in range(SQUARES + 1)] for n in range(len(DARK) + 1)]
+
+
+class Material(NamedTuple):
+    """ Piece counts in `Position` order """
+
+    red_men: int
+    white_men: int
+    red_kings: int
+    white_kings: int
+
+    @property
+    def pieces(self) -> int:
+        return sum(self)
+
+    def mirror(self) -> 'Material':
+        return Material(self.white_men, self.red_men, self.white_kings, self.red_kings)
+
+    @property
+    def canonical(self) -> bool:
+        """ Only one of a material and its colour-swapped mirror is stored """
+
+        return self <= self.mirror()
+
+    @property
+    def size(self) -> int:
+        """ Index range of one side to move, illegal placements included """
+
+        size = 1
+        for count in self:
+            size *= _COMB[len(DARK)][count]
+        return size
+
+    @classmethod
+    def of(cls, position: Position) -> 'Material':
+        return cls(*(mask.bit_count() for mask in position))
+
+
+class Outcome(IntEnum):
+    DRAW = 0
+    WIN = 1
+    LOSS = 2
+
+
+class Result(NamedTuple):
+    """ Game theoretic value for the side to move and plies until it is reached """
+
+    outcome: Outcome
+    distance: int
+
+    def score(self, ply: int = 0) -> float:
+        """ Value for the side to move `ply` plies into a search, sooner wins first """
+
+        if self.outcome == Outcome.WIN:
+            return WIN_VALUE - ply - self.distance
+        if self.outcome == Outcome.LOSS:
+            return ply + self.distance - WIN_VALUE
+        return 0.0
+
+
+def encode(result: Result) -> int:
+    if result.outcome == Outcome.WIN:
+        return min(result.distance, MAX_DISTANCE + 1)
+    if result.outcome == Outcome.LOSS:
+        return LOSS + min(result.distance, MAX_DISTANCE)
+    return DRAW
+
+
+def decode(value: int) -> Result | None:
+    if value == UNUSED:
+        return None
+    if value == DRAW:
+        return Result(Outcome.DRAW, 0)
+    if value < LOSS:
+        return Result(Outcome.WIN, value)
+    return Result(Outcome.LOSS, value - LOSS)
+
+
+def flip(mask: int) -> int:
+    """ Rotate a mask half a turn, which swaps the sides' directions """
+
+    return int(format(mask, f'0{SQUARES}b')[::-1], 2)
+
+
+def rank(mask: int) -> int:
+    """ Position of a set of dark squares in the combinatorial number system """
+
+    index = 0
+    for count, square in enumerate(squares(mask), 1):
+        index += _COMB[ORDINAL[square]][count]
+    return index
+
+
+def index(material: Material, position: Position) -> int:
+    result = 0
+    for count, mask in zip(material, position):
+        result = result * _COMB[len(DARK)][count] + rank(mask)
+    return result
+
+
+def locate(position: Position, side: int) -> tuple[Material, int, int] | None:
+    """ Stored material, side to move and index of a position, None if a side has no pieces """
+
+    material = Material.of(position)
+    if not material.red_men + material.red_kings \
+            or not material.white_men + material.white_kings:
+        return None
+
+    if not material.canonical:
+        red_men, white_men, red_kings, white_kings = position
+        position = Position(flip(white_men), flip(red_men), flip(white_kings), flip(red_kings))
+        material = material.mirror()
+        side = 1 - side
+    return material, side, index(material, position)
+
+
+class Tablebase:
+    """
+    Read-only view of a tablebase file. The file is mapped rather than read,
+    so every process probing the same file shares its pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, rows, cols, self.pieces, count = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase")
+        if (rows, cols) != (Dimensions.ROW, Dimensions.COL):
+            raise ValueError(f"{path} is for a {rows}x{cols} board")
+
+        self._offsets: dict[Material, tuple[int, int]] = {}
+        for entry in range(count):
+            *counts, offset, size = ENTRY.unpack_from(
+                self._data, HEADER.size + entry * ENTRY.size
+            )
+            self._offsets[Material(*counts)] = offset, size
+
+        self.hits = self.misses = 0
+
+    def __enter__(self) -> 'Tablebase':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._data.close()
+
+    def materials(self) -> list[Material]:
+        return list(self._offsets)
+
+    def probe(self, position: Position, side: int) -> Result | None:
+        """ Value of `position` with `side` to move, None when it is not covered """
+
+        located = locate(position, side)
+        if located is None or located[0] not in self._offsets:
+            self.misses += 1
+            return None
+
+        material, side, position_index = located
+        offset, size = self._offsets[material]
+        result = decode(self._data[offset + side * size + position_index])
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+
+def open_default() -> Tablebase | None:
+    """ The tablebase at `DEFAULT_PATH`, if one has been generated """
+
+    if not os.path.exists(DEFAULT_PATH):
+        return None
+    return Tablebase(DEFAULT_PATH)
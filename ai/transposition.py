@@ -0,0 +1,153 @@
+""" Transposition table for the alpha-beta search """
+import sys
+from enum import Enum, IntEnum
+from typing import NamedTuple
+
+from ai.tablebase import WIN_THRESHOLD
+from checker.bitboard import Move
+
+
+class Bound(IntEnum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+class Replacement(Enum):
+    ALWAYS = 'always'
+    DEPTH_PREFERRED = 'depth-preferred'
+    # A depth-preferred slot backed by an always-replace slot per bucket
+    TWO_TIER = 'two-tier'
+
+
+class Entry(NamedTuple):
+    key: int
+    depth: int
+    bound: Bound
+    value: float
+    move: Move | None
+
+
+def _to_table(value: float, ply: int) -> float:
+    """ Wins and losses count plies from the root, stored they count from the entry's node """
+
+    if value > WIN_THRESHOLD:
+        return value + ply
+    if value < -WIN_THRESHOLD:
+        return value - ply
+    return value
+
+
+def _from_table(value: float, ply: int) -> float:
+    return _to_table(value, -ply)
+
+
+class TranspositionTable:
+    """ Fixed size hash table of searched positions """
+
+    def __init__(
+        self,
+        size: int = 1 << 18,
+        replacement: Replacement = Replacement.TWO_TIER
+    ):
+        # Round up to a power of two so the bucket is a mask of the key
+        self.size = 1 << max(size - 1, 1).bit_length()
+        self.mask = self.size - 1
+        self.replacement = replacement
+
+        self.clear()
+
+    def clear(self):
+        self._depth_slots: list[Entry | None] = [None] * self.size
+        self._always_slots: list[Entry | None] = \
+            [None] * self.size if self.replacement == Replacement.TWO_TIER else []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.cutoffs = 0
+        self.stores = self.overwrites = 0
+
+    def get(self, key: int) -> Entry | None:
+        """ Look up a key without touching the statistics """
+
+        index = key & self.mask
+        for slots in (self._depth_slots, self._always_slots):
+            if slots:
+                entry = slots[index]
+                if entry is not None and entry.key == key:
+                    return entry
+        return None
+
+    def probe(self, key: int, ply: int = 0) -> Entry | None:
+        """ The entry of `key` with win and loss scores for a node `ply` plies from the root """
+
+        index = key & self.mask
+        for slots in (self._depth_slots, self._always_slots):
+            if slots:
+                entry = slots[index]
+                if entry is not None and entry.key == key:
+                    self.hits += 1
+                    return entry._replace(value=_from_table(entry.value, ply))
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        key: int,
+        depth: int,
+        bound: Bound,
+        value: float,
+        move: Move | None,
+        ply: int = 0
+    ):
+        index = key & self.mask
+        entry = Entry(key, depth, bound, _to_table(value, ply), move)
+        self.stores += 1
+
+        current = self._depth_slots[index]
+        if current is None or current.key == key \
+                or self.replacement == Replacement.ALWAYS \
+                or current.depth <= depth:
+            if current is not None and current.key != key:
+                self.overwrites += 1
+            self._depth_slots[index] = entry
+        elif self.replacement == Replacement.TWO_TIER:
+            if self._always_slots[index] is not None:
+                self.overwrites += 1
+            self._always_slots[index] = entry
+
+    def __len__(self) -> int:
+        return sum(
+            entry is not None
+            for entry in self._depth_slots + self._always_slots
+        )
+
+    def memory(self) -> int:
+        """ Approximate size of the table in bytes """
+
+        size = sys.getsizeof(self._depth_slots) + sys.getsizeof(self._always_slots)
+        for entry in self._depth_slots + self._always_slots:
+            if entry is not None:
+                size += sys.getsizeof(entry)
+                if entry.move is not None:
+                    size += sys.getsizeof(entry.move)
+        return size
+
+    @property
+    def hit_rate(self) -> float:
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self) -> dict[str, int | float | str]:
+        return {
+            'size': self.size,
+            'replacement': self.replacement.value,
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'cutoffs': self.cutoffs,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'hit_rate': self.hit_rate,
+        }
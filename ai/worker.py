@@ -0,0 +1,95 @@
+""" Background search so the render loop keeps running while the AI thinks """
+import logging
+import threading
+from copy import deepcopy
+from typing import Callable
+
+from ai.algorithm import Algorithm
+from checker.bitboard import Play, Position
+from checker.board import Board
+
+
+class SearchWorker:
+    """
+    Runs `Algorithm.iterative_deepening` on a daemon thread. `on_done` is
+    called from that thread when a search finishes without being cancelled,
+    so a caller blocked on its own events can be woken up.
+    """
+
+    def __init__(self, algorithm: Algorithm, on_done: Callable[[], None] | None = None):
+        self.algorithm = algorithm
+        self.on_done = on_done
+        self.logger = logging.getLogger(__name__)
+        # Position the last search started from, to tell a stale result
+        self.root: Position | None = None
+
+        self._thread: threading.Thread | None = None
+        self._finished = threading.Event()
+        self._result: tuple[float, Play | None, int] | None = None
+        self._error: BaseException | None = None
+        self._cancelled = False
+
+    @property
+    def busy(self) -> bool:
+        return self._thread is not None and not self._finished.is_set()
+
+    def start(self, board: Board, max_player: bool, budget_ms: int):
+        """ Search a private copy of `board`, the caller's board is never touched """
+
+        self.cancel()
+        self._cancelled = False
+        self._result = self._error = None
+        self._finished.clear()
+        self.root = board.position()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(deepcopy(board), max_player, budget_ms),
+            name='ai-search',
+            daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, board: Board, max_player: bool, budget_ms: int):
+        try:
+            result = self.algorithm.iterative_deepening(
+                board, max_player, budget_ms
+            )
+        except BaseException as error:
+            self.logger.exception('AI search failed')
+            self._error = error
+        else:
+            if not self._cancelled:
+                self._result = result
+        finally:
+            # Set before `on_done`, so a woken caller already sees the result
+            self._finished.set()
+
+        if self.on_done is not None and not self._cancelled:
+            self.on_done()
+
+    def poll(self) -> tuple[float, Play | None, int] | None:
+        """ The finished search result, handed out once """
+
+        if self.busy or self._thread is None:
+            return None
+
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+
+        result, self._result = self._result, None
+        return result
+
+    def cancel(self):
+        """ Abandon the running search, if any, and wait for the thread """
+
+        if self._thread is None:
+            return
+
+        self._cancelled = True
+        self.algorithm.cancel()
+        self._thread.join()
+        self.algorithm.cancelled.clear()
+        self._thread = None
+        self._result = None
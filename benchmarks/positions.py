@@ -0,0 +1,32 @@
+""" Fixed 12x12 positions the benchmarks run from """
+from checker.bitboard import Bitboard, Position
+from checker.board import Board
+
+
+# name -> (position, max_player), white is to move in all of them
+POSITIONS: dict[str, tuple[Position, bool]] = {
+    'opening': (Bitboard.initial().position(), False),
+    'middlegame': (
+        Position(
+            red_men=0x444000501aaa554aaa,
+            white_men=0x555aaa551a00451000010080000000000000,
+            red_kings=0,
+            white_kings=0
+        ),
+        False
+    ),
+    'endgame': (
+        Position(
+            red_men=0x10000440a00101800,
+            white_men=0x80a100000001000000000010000000000,
+            red_kings=0x500000000000000000000000000000000000,
+            white_kings=0x8
+        ),
+        False
+    ),
+}
+
+
+def load(name: str) -> tuple[Board, bool]:
+    position, max_player = POSITIONS[name]
+    return Board.from_position(position), max_player
@@ -0,0 +1,272 @@
+""" Benchmarks for move generation, evaluation and search throughput """
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from copy import deepcopy
+
+from ai.algorithm import Algorithm
+from ai.ordering import MoveOrdering
+from benchmarks.positions import POSITIONS, load
+from checker.bitboard import RED, WHITE, Bitboard
+from checker.board import Board
+from checker.perft import Perft
+
+try:
+    from ai.evaluation import Evaluator
+except ImportError:
+    # NumPy is optional, without it the batch evaluator is not benchmarked
+    Evaluator = None
+
+
+HEURISTICS = ('captures', 'killers', 'history')
+
+# A metric is {"value": ..., "unit": ..., "better": "higher" | "lower" | "equal" | None}
+Metric = dict[str, float | str | None]
+
+
+def bench_perft(max_depth: int) -> dict[str, Metric]:
+    results: dict[str, Metric] = {}
+    for name, (position, max_player) in POSITIONS.items():
+        side = RED if max_player else WHITE
+        for depth in range(1, max_depth + 1):
+            # Uncached so the rate measures move generation itself
+            counter = Perft(Bitboard.from_position(position), cache=False)
+            start = time.perf_counter()
+            nodes = counter.count(side, depth)
+            seconds = time.perf_counter() - start
+
+            results[f'perft.{name}.d{depth}.nodes'] = \
+                {'value': nodes, 'unit': 'nodes', 'better': 'equal'}
+            results[f'perft.{name}.d{depth}.nps'] = \
+                {'value': nodes / seconds, 'unit': 'nodes/s', 'better': 'higher'}
+    return results
+
+
+def bench_search(
+    method: str,
+    max_depth: int,
+    heuristics: tuple[str, ...] = HEURISTICS
+) -> dict[str, Metric]:
+    results: dict[str, Metric] = {}
+    for name in POSITIONS:
+        board, max_player = load(name)
+        for depth in range(1, max_depth + 1):
+            algorithm = Algorithm(ordering=MoveOrdering(
+                **{heuristic: heuristic in heuristics for heuristic in HEURISTICS}
+            ))
+            start = time.perf_counter()
+            if method == 'minimax':
+                algorithm.minimax(board, depth, max_player)
+            else:
+                algorithm.alpha_beta(
+                    board, depth, max_player, float('-inf'), float('inf')
+                )
+            seconds = time.perf_counter() - start
+
+            # Node counts move with search changes, so they are informational
+            results[f'{method}.{name}.d{depth}.nodes'] = \
+                {'value': algorithm.nodes, 'unit': 'nodes', 'better': None}
+            results[f'{method}.{name}.d{depth}.nps'] = \
+                {'value': algorithm.nodes / seconds, 'unit': 'nodes/s', 'better': 'higher'}
+            if method == 'minimax':
+                continue
+
+            # Effective branching factor: the average fan-out the search paid for
+            results[f'{method}.{name}.d{depth}.ebf'] = \
+                {'value': algorithm.nodes ** (1 / depth), 'unit': 'nodes/ply', 'better': None}
+            ordering = algorithm.ordering.stats()
+            results[f'{method}.{name}.d{depth}.first_move_cutoffs'] = \
+                {'value': ordering['first_move_cutoff_rate'], 'unit': 'ratio', 'better': None}
+            results[f'{method}.{name}.d{depth}.quiescence_nodes'] = \
+                {'value': algorithm.quiescence_nodes, 'unit': 'nodes', 'better': None}
+    return results
+
+
+def bench_latency(number: int, repeat: int) -> dict[str, Metric]:
+    """ `check_winner` both with its cache emptied before every call and as a cache hit """
+
+    results: dict[str, Metric] = {}
+    for name in POSITIONS:
+        board, _ = load(name)
+
+        def check_winner():
+            board._winners.clear()
+            return board.check_winner()
+
+        functions = {
+            'evaluate': board.evaluate,
+            'check_winner': check_winner,
+            'check_winner_cached': board.check_winner,
+        }
+        for label, function in functions.items():
+            best = min(timeit.Timer(function).repeat(repeat=repeat, number=number))
+            results[f'{label}.{name}.latency'] = \
+                {'value': best / number * 1e9, 'unit': 'ns/call', 'better': 'lower'}
+    return results
+
+
+def _allocated(make, count: int = 100) -> float:
+    """ Bytes allocated per object by `make`, averaged over `count` live objects """
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make() for _ in range(count)]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del objects
+    return allocated / count
+
+
+def bench_memory(number: int, repeat: int) -> dict[str, Metric]:
+    """ Size and copy cost of a position, bare and with the UI's grid of pieces """
+
+    results: dict[str, Metric] = {}
+    for name, (position, _) in POSITIONS.items():
+        board = Board.from_position(position)
+        results[f'board.{name}.bytes'] = {
+            'value': _allocated(lambda: Board.from_position(position)),
+            'unit': 'B', 'better': 'lower'
+        }
+        results[f'grid.{name}.bytes'] = {
+            'value': _allocated(lambda: Board.from_position(position).board),
+            'unit': 'B', 'better': 'lower'
+        }
+
+        best = min(timeit.Timer(lambda: deepcopy(board)).repeat(repeat=repeat, number=number))
+        results[f'deepcopy.{name}.latency'] = \
+            {'value': best / number * 1e9, 'unit': 'ns/call', 'better': 'lower'}
+
+        def build_grid():
+            board._grid = None
+            return board.board
+
+        best = min(timeit.Timer(build_grid).repeat(repeat=repeat, number=number // 10 or 1))
+        results[f'grid.{name}.latency'] = \
+            {'value': best / (number // 10 or 1) * 1e9, 'unit': 'ns/call', 'better': 'lower'}
+    return results
+
+
+def bench_batch(size: int, repeat: int) -> dict[str, Metric]:
+    if Evaluator is None:
+        return {}
+
+    evaluator = Evaluator()
+    positions = [position for position, _ in POSITIONS.values()]
+    batch = positions * (size // len(positions))
+    best = min(
+        timeit.Timer(lambda: evaluator.evaluate_batch(batch)).repeat(repeat=repeat, number=1)
+    )
+    return {
+        'evaluate_batch.throughput':
+            {'value': len(batch) / best, 'unit': 'positions/s', 'better': 'higher'},
+    }
+
+
+def run(
+    perft_depth: int = 4,
+    search_depth: int = 6,
+    minimax_depth: int = 5,
+    number: int = 1000,
+    repeat: int = 5,
+    heuristics: tuple[str, ...] = HEURISTICS
+) -> dict:
+    results: dict[str, Metric] = {}
+    results.update(bench_perft(perft_depth))
+    results.update(bench_search('minimax', minimax_depth))
+    results.update(bench_search('alpha_beta', search_depth, heuristics))
+    results.update(bench_latency(number, repeat))
+    results.update(bench_memory(number, repeat))
+    results.update(bench_batch(number * 10, repeat))
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'ordering': list(heuristics),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """ Metrics that got worse than `baseline` by more than `threshold` """
+
+    regressions = []
+    for name, old in baseline['results'].items():
+        new = current['results'].get(name)
+        if new is None or old['better'] is None:
+            continue
+
+        before, after = old['value'], new['value']
+        if old['better'] == 'equal':
+            worse = after != before
+        elif old['better'] == 'higher':
+            worse = after < before * (1 - threshold)
+        else:
+            worse = after > before * (1 + threshold)
+
+        if worse:
+            regressions.append(
+                f"{name}: {before:.6g} -> {after:.6g} {old['unit']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the engine benchmarks')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help='compare against this earlier output')
+    parser.add_argument(
+        '--threshold', type=float, default=0.10,
+        help='allowed relative slowdown before a metric counts as a regression'
+    )
+    parser.add_argument('--perft-depth', type=int, default=4)
+    parser.add_argument('--search-depth', type=int, default=6)
+    parser.add_argument(
+        '--minimax-depth', type=int, default=5,
+        help='full-width minimax, depth 6 takes minutes on the middlegame'
+    )
+    parser.add_argument('--number', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--ordering', default=','.join(HEURISTICS),
+        help='comma separated move ordering heuristics to enable, empty for none'
+    )
+    args = parser.parse_args()
+    heuristics = tuple(filter(None, args.ordering.split(',')))
+    unknown = set(heuristics) - set(HEURISTICS)
+    if unknown:
+        parser.error(f"unknown heuristics: {', '.join(sorted(unknown))}")
+
+    current = run(
+        args.perft_depth,
+        args.search_depth,
+        args.minimax_depth,
+        args.number,
+        args.repeat,
+        heuristics
+    )
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(current, file, indent=2)
+
+    for name, metric in current['results'].items():
+        print(f"{name:40} {metric['value']:>14.6g} {metric['unit']}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+        regressions = compare(current, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
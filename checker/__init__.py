@@ -1,7 +1,6 @@
 import logging
 
 from .board import *
-from .game import *
 from .piece import *
 
 
@@ -0,0 +1,351 @@
+"""
+Binary game archive: packed positions and move lists, written and read as
+a stream, with a separate file of offsets for random access by game number.
+
+Archive:  header, then one length-prefixed record per game
+Record:   flags, winner, plies, the start position if not the usual one,
+          then per move source and target as dark square ordinals in a
+          little-endian u16 (bit 14 set for captures), followed for
+          captures by the number of pieces taken and their ordinals
+Index:    header, then the offset of every record as a u64
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterator
+
+from checker.bitboard import RED, WHITE, Move, Position, squares
+from checker.constants import Dimensions
+from checker.geometry import DARK, ORDINAL
+from checker.notation import WINNERS, GameRecord, format_game
+
+
+MAGIC = b'CKGA'
+INDEX_MAGIC = b'CKGI'
+VERSION = 1
+
+# magic, version, rows, cols
+HEADER = struct.Struct('<4sHBB')
+# magic, version
+INDEX_HEADER = struct.Struct('<4sH2x')
+# bytes after this field, flags, winner, plies
+RECORD = struct.Struct('<IBBH')
+OFFSET = struct.Struct('<Q')
+MOVE = struct.Struct('<H')
+
+# Record flags
+CUSTOM_START = 1
+RED_FIRST = 2
+
+CAPTURE = 1 << 14
+# Bytes per side and piece kind of a packed position, one bit per dark square
+MASK_BYTES = (len(DARK) + 7) // 8
+POSITION_BYTES = 4 * MASK_BYTES
+START = GameRecord(()).start
+
+# Large reads keep a streaming pass from making a system call per game
+BUFFER_SIZE = 1 << 20
+
+
+def pack_position(position: Position) -> bytes:
+    """ 36 bytes: red men, white men, red kings and white kings over the dark squares """
+
+    packed = bytearray()
+    for mask in position:
+        dark = 0
+        for square in squares(mask):
+            dark |= 1 << ORDINAL[square]
+        packed += dark.to_bytes(MASK_BYTES, 'little')
+    return bytes(packed)
+
+
+def unpack_position(data: bytes | mmap.mmap, offset: int = 0) -> Position:
+    masks = []
+    for field in range(4):
+        start = offset + field * MASK_BYTES
+        dark = int.from_bytes(data[start:start + MASK_BYTES], 'little')
+        mask = 0
+        for ordinal in squares(dark):
+            mask |= 1 << DARK[ordinal]
+        masks.append(mask)
+    return Position(*masks)
+
+
+def encode_game(record: GameRecord) -> bytes:
+    flags = 0 if record.start == START else CUSTOM_START
+    if record.side == RED:
+        flags |= RED_FIRST
+
+    body = bytearray()
+    if flags & CUSTOM_START:
+        body += pack_position(record.start)
+    for move in record.moves:
+        word = ORDINAL[move.source] | ORDINAL[move.target] << 7
+        if move.captured:
+            taken = [ORDINAL[square] for square in squares(move.captured)]
+            body += MOVE.pack(word | CAPTURE)
+            body.append(len(taken))
+            body += bytes(taken)
+        else:
+            body += MOVE.pack(word)
+
+    winner = WINNERS.index(record.winner) + 1 if record.winner else 0
+    size = RECORD.size - 4 + len(body)
+    return RECORD.pack(size, flags, winner, len(record.moves)) + body
+
+
+def decode_game(data: bytes | mmap.mmap, offset: int = 0) -> tuple[GameRecord, int]:
+    """ The record at `offset` and the offset of the one after it """
+
+    size, flags, winner, plies = RECORD.unpack_from(data, offset)
+    end = offset + 4 + size
+    if end > len(data):
+        raise ValueError(f"Record at {offset} is cut short")
+
+    position = offset + RECORD.size
+    start = START
+    if flags & CUSTOM_START:
+        start = unpack_position(data, position)
+        position += POSITION_BYTES
+
+    moves = []
+    for _ in range(plies):
+        word, = MOVE.unpack_from(data, position)
+        position += MOVE.size
+        captured = 0
+        if word & CAPTURE:
+            count = data[position]
+            for ordinal in data[position + 1:position + 1 + count]:
+                captured |= 1 << DARK[ordinal]
+            position += 1 + count
+        moves.append(Move(DARK[word & 0x7F], DARK[word >> 7 & 0x7F], captured))
+
+    return GameRecord(
+        tuple(moves),
+        WINNERS[winner - 1] if winner else None,
+        start,
+        RED if flags & RED_FIRST else WHITE
+    ), end
+
+
+def _check_header(data: bytes, path: str):
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a game archive")
+    magic, version, rows, cols = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} game archive")
+    if (rows, cols) != (Dimensions.ROW, Dimensions.COL):
+        raise ValueError(f"{path} is for a {rows}x{cols} board")
+
+
+def _check_index_header(data: bytes, path: str):
+    if len(data) < INDEX_HEADER.size or INDEX_HEADER.unpack_from(data) != (INDEX_MAGIC, VERSION):
+        raise ValueError(f"{path} is not a version {VERSION} game index")
+
+
+def index_path_of(path: str) -> str:
+    return path + '.idx'
+
+
+class GameReader:
+    """ Reads an archive front to back, holding one record in memory at a time """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file: BinaryIO = open(path, 'rb', buffering=BUFFER_SIZE)
+        _check_header(self._file.read(HEADER.size), path)
+
+    def __enter__(self) -> 'GameReader':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for _, record in self.records():
+            yield record
+
+    def records(self) -> Iterator[tuple[int, GameRecord]]:
+        """ (offset, record) pairs from the start of the archive """
+
+        self._file.seek(HEADER.size)
+        offset = HEADER.size
+        while True:
+            prefix = self._file.read(4)
+            if not prefix:
+                return
+            body = self._file.read(struct.unpack('<I', prefix)[0]) if len(prefix) == 4 else b''
+            if len(prefix) < 4 or len(body) < struct.unpack('<I', prefix)[0]:
+                raise ValueError(f"{self.path}: record at {offset} is cut short")
+
+            record, _ = decode_game(prefix + body)
+            yield offset, record
+            offset += 4 + len(body)
+
+
+class GameWriter:
+    """
+    Appends games to an archive and their offsets to its index as they come,
+    so memory use does not grow with the number of games.
+    """
+
+    def __init__(self, path: str, index_path: str | None = None):
+        self.path = path
+        self.index_path = index_path or index_path_of(path)
+
+        self._data = open(path, 'ab', buffering=BUFFER_SIZE)
+        if self._data.seek(0, io.SEEK_END) == 0:
+            self._data.write(HEADER.pack(MAGIC, VERSION, Dimensions.ROW, Dimensions.COL))
+        else:
+            with open(path, 'rb') as file:
+                _check_header(file.read(HEADER.size), path)
+        self._data.flush()
+
+        # A crash between the two files leaves the index behind the records
+        if not os.path.exists(self.index_path) or not self._index_matches():
+            build_index(path, self.index_path)
+        self._index = open(self.index_path, 'ab')
+        self.count = (self._index.seek(0, io.SEEK_END) - INDEX_HEADER.size) // OFFSET.size
+
+    def _index_matches(self) -> bool:
+        """ Whether the index covers exactly the records in the archive """
+
+        with open(self.index_path, 'rb') as file:
+            _check_index_header(file.read(INDEX_HEADER.size), self.index_path)
+            if file.seek(0, io.SEEK_END) == INDEX_HEADER.size:
+                return self._data.tell() == HEADER.size
+            file.seek(-OFFSET.size, io.SEEK_END)
+            last, = OFFSET.unpack(file.read(OFFSET.size))
+
+        with open(self.path, 'rb') as file:
+            file.seek(last)
+            prefix = file.read(4)
+        return len(prefix) == 4 and last + 4 + struct.unpack('<I', prefix)[0] == self._data.tell()
+
+    def __enter__(self) -> 'GameWriter':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, record: GameRecord) -> int:
+        """ Append `record`, returning its game number """
+
+        self._index.write(OFFSET.pack(self._data.tell()))
+        self._data.write(encode_game(record))
+        self.count += 1
+        return self.count - 1
+
+    def flush(self):
+        # Records before offsets, so a crash leaves no offset past the data
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+def build_index(path: str, index_path: str | None = None) -> int:
+    """ Write the index of an archive in one streaming pass, returning the number of games """
+
+    count = 0
+    with GameReader(path) as reader, \
+            open(index_path or index_path_of(path), 'wb', buffering=BUFFER_SIZE) as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION))
+        for offset, _ in reader.records():
+            file.write(OFFSET.pack(offset))
+            count += 1
+    return count
+
+
+class GameIndex:
+    """
+    Random access to the games of an archive by number. Both files are
+    mapped, so opening costs the same whatever their size and only the
+    pages of the games read are loaded.
+    """
+
+    def __init__(self, path: str, index_path: str | None = None):
+        self.path = path
+        self.index_path = index_path or index_path_of(path)
+
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.index_path, 'rb') as file:
+            self._index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._data[:HEADER.size], path)
+        _check_index_header(self._index[:INDEX_HEADER.size], self.index_path)
+
+        self._count = (len(self._index) - INDEX_HEADER.size) // OFFSET.size
+
+    def __enter__(self) -> 'GameIndex':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def offset(self, number: int) -> int:
+        if number < 0:
+            number += self._count
+        if not 0 <= number < self._count:
+            raise IndexError(f"No game {number} in {self.path}")
+        return OFFSET.unpack_from(self._index, INDEX_HEADER.size + number * OFFSET.size)[0]
+
+    def __getitem__(self, number: int) -> GameRecord:
+        return decode_game(self._data, self.offset(number))[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert, index and read game archives')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='append ai.selfplay JSONL games to an archive')
+    convert.add_argument('selfplay')
+    convert.add_argument('archive')
+
+    index = commands.add_parser('index', help='rebuild the index of an archive')
+    index.add_argument('archive')
+
+    show = commands.add_parser('show', help='print games in text notation')
+    show.add_argument('archive')
+    show.add_argument('games', nargs='*', type=int, help='game numbers, all when none')
+
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        with open(args.selfplay, encoding='utf-8') as file, GameWriter(args.archive) as writer:
+            for line in file:
+                game = json.loads(line)
+                winner = game['winner'] if game['winner'] in WINNERS else None
+                writer.write(GameRecord(tuple(Move(*move) for move in game['moves']), winner))
+            print(f"{writer.count} games in {args.archive}")
+    elif args.command == 'index':
+        print(f"Indexed {build_index(args.archive)} games")
+    elif args.games:
+        with GameIndex(args.archive) as games:
+            for number in args.games:
+                print(format_game(games[number]))
+    else:
+        with GameReader(args.archive) as reader:
+            for record in reader:
+                sys.stdout.write(format_game(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+""" Bitboard engine core """
+from typing import Iterator, NamedTuple
+
+from checker.geometry import (
+    ALL_DIRECTIONS, BOARD_MASK, FORWARD, JUMP_SOURCES, JUMP_TARGETS, KING,
+    PLAYABLE, PROMOTION, SQUARES, START, STEP_SOURCES, STEP_TARGETS, STEPS,
+    coordinate_of, square_of)
+
+
+RED, WHITE = 0, 1
+
+
+def squares(mask: int) -> Iterator[int]:
+    """ Yield the square index of every set bit, lowest first """
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _shift(mask: int, step: int) -> int:
+    if step > 0:
+        return (mask << step) & BOARD_MASK
+    return mask >> -step
+
+
+class Move(NamedTuple):
+    source: int
+    target: int
+    captured: int = 0
+
+
+class Play(NamedTuple):
+    """ A move spelled out for callers: every square landed on and every piece taken """
+
+    source: int
+    path: tuple[int, ...]
+    captured: tuple[int, ...] = ()
+    promotion: bool = False
+
+    @property
+    def target(self) -> int:
+        return self.path[-1]
+
+    def move(self) -> Move:
+        captured = 0
+        for square in self.captured:
+            captured |= 1 << square
+        return Move(self.source, self.target, captured)
+
+    def __str__(self) -> str:
+        separator = 'x' if self.captured else '-'
+        return separator.join(
+            f"{row},{col}" for row, col in map(coordinate_of, (self.source, *self.path))
+        )
+
+
+class Position(NamedTuple):
+    """ Compact, picklable copy of a bitboard """
+
+    red_men: int
+    white_men: int
+    red_kings: int
+    white_kings: int
+
+
+class Undo(NamedTuple):
+    move: Move
+    side: int
+    king: bool
+    promoted: bool
+    captured_kings: int
+
+
+class Bitboard:
+    """ Board state as one integer bitmask per side for men and kings """
+
+    __slots__ = ('men', 'kings')
+
+    def __init__(self, men: list[int] | None = None, kings: list[int] | None = None):
+        self.men = men if men is not None else [0, 0]
+        self.kings = kings if kings is not None else [0, 0]
+
+    @classmethod
+    def initial(cls) -> 'Bitboard':
+        return cls(list(START), [0, 0])
+
+    @classmethod
+    def from_position(cls, position: Position) -> 'Bitboard':
+        return cls(
+            [position.red_men, position.white_men],
+            [position.red_kings, position.white_kings]
+        )
+
+    def position(self) -> Position:
+        return Position(self.men[RED], self.men[WHITE], self.kings[RED], self.kings[WHITE])
+
+    def copy(self) -> 'Bitboard':
+        return Bitboard(self.men[:], self.kings[:])
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Bitboard):
+            return NotImplemented
+        return self.men == other.men and self.kings == other.kings
+
+    def __repr__(self) -> str:
+        return f"Bitboard(men={self.men}, kings={self.kings})"
+
+    def pieces(self, side: int) -> int:
+        return self.men[side] | self.kings[side]
+
+    @property
+    def occupied(self) -> int:
+        return self.men[RED] | self.men[WHITE] | self.kings[RED] | self.kings[WHITE]
+
+    @property
+    def empty(self) -> int:
+        return PLAYABLE & ~self.occupied
+
+    def side_at(self, square: int) -> int | None:
+        bit = 1 << square
+        if (self.men[RED] | self.kings[RED]) & bit:
+            return RED
+        if (self.men[WHITE] | self.kings[WHITE]) & bit:
+            return WHITE
+        return None
+
+    def is_king(self, square: int) -> bool:
+        return bool((self.kings[RED] | self.kings[WHITE]) >> square & 1)
+
+    def _jumpers(self, side: int, empty: int, opponent: int) -> int:
+        """ Pieces of `side` that have a capture available """
+
+        men, kings = self.men[side], self.kings[side]
+        forward = FORWARD[side]
+
+        jumpers = 0
+        for direction in ALL_DIRECTIONS:
+            step = STEPS[direction]
+            movers = men | kings if direction in forward else kings
+            jumpers |= movers & JUMP_SOURCES[direction] \
+                & _shift(opponent, -step) & _shift(empty, -2 * step)
+        return jumpers
+
+    def _kind(self, side: int, source: int) -> int:
+        """ Index of the piece on `source` into the geometry tables """
+
+        return KING if self.kings[side] >> source & 1 else side
+
+    def moves(self, side: int) -> list[Move]:
+        """
+        Every legal move of one side. Capturing is mandatory, so when any
+        capture exists only captures are returned, each one a complete chain.
+        """
+
+        moves = self.captures(side)
+        if moves:
+            return moves
+
+        empty = self.empty
+        men, kings = self.men[side], self.kings[side]
+        forward = FORWARD[side]
+
+        moves = []
+        for direction in ALL_DIRECTIONS:
+            step = STEPS[direction]
+            movers = men | kings if direction in forward else kings
+            targets = _shift(movers & STEP_SOURCES[direction], step) & empty
+            while targets:
+                low = targets & -targets
+                target = low.bit_length() - 1
+                moves.append(Move(target - step, target))
+                targets ^= low
+
+        return moves
+
+    def captures(self, side: int) -> list[Move]:
+        """ Every complete capture chain of one side, empty when it cannot capture """
+
+        empty = self.empty
+        opponent = self.pieces(1 - side)
+
+        moves: list[Move] = []
+        for source in squares(self._jumpers(side, empty, opponent)):
+            self._captures(
+                source, source, self._kind(side, source),
+                opponent, empty | 1 << source, 0, moves
+            )
+        return moves
+
+    def has_moves(self, side: int) -> bool:
+        """ Whether `side` can move at all, stopping at the first move found """
+
+        men, kings = self.men[side], self.kings[side]
+        empty = self.empty
+        forward = FORWARD[side]
+
+        for direction in ALL_DIRECTIONS:
+            movers = men | kings if direction in forward else kings
+            if _shift(movers & STEP_SOURCES[direction], STEPS[direction]) & empty:
+                return True
+
+        return bool(self._jumpers(side, empty, self.pieces(1 - side)))
+
+    def count_moves(self, side: int) -> int:
+        """ Number of legal moves, without building them when none capture """
+
+        empty = self.empty
+        opponent = self.pieces(1 - side)
+
+        if self._jumpers(side, empty, opponent):
+            return len(self.moves(side))
+        return self.count_steps(side, empty)
+
+    def count_steps(self, side: int, empty: int | None = None) -> int:
+        """ Number of simple moves, whether or not a capture makes them illegal """
+
+        if empty is None:
+            empty = self.empty
+        men, kings = self.men[side], self.kings[side]
+        forward = FORWARD[side]
+
+        count = 0
+        for direction in ALL_DIRECTIONS:
+            movers = men | kings if direction in forward else kings
+            count += (
+                _shift(movers & STEP_SOURCES[direction], STEPS[direction]) & empty
+            ).bit_count()
+        return count
+
+    def piece_moves(self, source: int) -> list[Move]:
+        """ Legal moves of the piece standing on `source` """
+
+        side = self.side_at(source)
+        if side is None:
+            return []
+
+        empty = self.empty
+        opponent = self.pieces(1 - side)
+        kind = self._kind(side, source)
+
+        moves: list[Move] = []
+        if self._jumpers(side, empty, opponent):
+            self._captures(
+                source, source, kind, opponent, empty | 1 << source, 0, moves
+            )
+            return moves
+
+        for target in STEP_TARGETS[kind][source]:
+            if empty >> target & 1:
+                moves.append(Move(source, target))
+        return moves
+
+    def _captures(
+        self,
+        source: int,
+        square: int,
+        kind: int,
+        opponent: int,
+        empty: int,
+        captured: int,
+        moves: list[Move]
+    ):
+        """ Follow every capture chain from `square`, adding the ones that end """
+
+        extended = False
+        for over, landing in JUMP_TARGETS[kind][square]:
+            if opponent >> over & 1 and not captured >> over & 1 and empty >> landing & 1:
+                extended = True
+                self._captures(
+                    source, landing, kind, opponent, empty,
+                    captured | 1 << over, moves
+                )
+
+        if not extended and captured:
+            move = Move(source, square, captured)
+            # Different orders over the same pieces are the same move
+            if move not in moves:
+                moves.append(move)
+
+    def describe(self, move: Move) -> Play:
+        """ Spell out a legal move of the current position as a `Play` """
+
+        side = self.side_at(move.source)
+        if side is None:
+            raise ValueError(f"No piece on square {move.source}")
+        kind = self._kind(side, move.source)
+
+        if move.captured:
+            path = self._path(
+                move.source, move.target, kind,
+                self.empty | 1 << move.source, move.captured
+            )
+            if path is None:
+                raise ValueError(f"No capture chain for {move}")
+        else:
+            path = [(move.target, None)]
+
+        return Play(
+            move.source,
+            tuple(landing for landing, _ in path),
+            tuple(over for _, over in path if over is not None),
+            kind != KING and bool(PROMOTION[side] >> move.target & 1)
+        )
+
+    def _path(
+        self,
+        square: int,
+        target: int,
+        kind: int,
+        empty: int,
+        remaining: int
+    ) -> list[tuple[int, int | None]] | None:
+        """ (landing, captured) jumps from `square` to `target` taking exactly `remaining` """
+
+        if not remaining:
+            return [] if square == target else None
+
+        for over, landing in JUMP_TARGETS[kind][square]:
+            if remaining >> over & 1 and empty >> landing & 1:
+                rest = self._path(landing, target, kind, empty, remaining & ~(1 << over))
+                if rest is not None:
+                    return [(landing, over), *rest]
+        return None
+
+    def apply(self, move: Move) -> Undo:
+        """ Play a move in place and return what is needed to take it back """
+
+        source, target = 1 << move.source, 1 << move.target
+        side = RED if (self.men[RED] | self.kings[RED]) & source else WHITE
+        opponent = 1 - side
+
+        captured_kings = self.kings[opponent] & move.captured
+        if move.captured:
+            self.men[opponent] &= ~move.captured
+            self.kings[opponent] &= ~move.captured
+
+        if self.kings[side] & source:
+            self.kings[side] = self.kings[side] & ~source | target
+            return Undo(move, side, True, False, captured_kings)
+
+        self.men[side] &= ~source
+        if PROMOTION[side] & target:
+            self.kings[side] |= target
+            return Undo(move, side, False, True, captured_kings)
+
+        self.men[side] |= target
+        return Undo(move, side, False, False, captured_kings)
+
+    def undo(self, record: Undo):
+        move, side = record.move, record.side
+        source, target = 1 << move.source, 1 << move.target
+
+        if record.promoted:
+            self.kings[side] &= ~target
+            self.men[side] |= source
+        elif record.king:
+            self.kings[side] = self.kings[side] & ~target | source
+        else:
+            self.men[side] = self.men[side] & ~target | source
+
+        if move.captured:
+            opponent = 1 - side
+            self.men[opponent] |= move.captured & ~record.captured_kings
+            self.kings[opponent] |= record.captured_kings
+
+    def remove(self, square: int):
+        keep = ~(1 << square)
+        for side in (RED, WHITE):
+            self.men[side] &= keep
+            self.kings[side] &= keep
@@ -1,90 +1,146 @@
 import random
+from copy import deepcopy
+from dataclasses import dataclass
 
-import pygame
-
-from checker.constants import (
-    Colors, ColorType, Coordinate, Dimensions, Direction)
+from checker.bitboard import (
+    RED, WHITE, Bitboard, Move, Play, Position, Undo, coordinate_of, square_of,
+    squares)
+from checker.constants import Colors, ColorType, Coordinate, Dimensions
 from checker.piece import Piece
+from checker.zobrist import PIECE_KEYS, hash_bitboard, move_key
+
+
+SIDE_COLORS = (Colors.RED, Colors.WHITE)
+
+# Value of each legal move more than the opponent has, a piece is worth 1
+MOBILITY_WEIGHT = 0.02
+
+# check_winner results each board keeps by position hash, dropped wholesale once full
+WINNER_CACHE_SIZE = 1 << 16
+
+
+@dataclass
+class MoveRecord:
+    """ Everything `Board.undo_move` needs to take a move back """
+
+    source: Coordinate
+    target: Coordinate
+    captured: list[Coordinate]
+    promoted: bool
+    counters: tuple[int, int, int, int]
+    undo: Undo
 
 
 class Board:
-    def __init__(self):
+    def __init__(self, debug: bool = False):
+        """ With `debug` every move checks the piece counters against a rescan """
+
+        self.debug = debug
         self.selected_piece = None
-        self.red_left = self.white_left = 30
-        self.red_kings = self.white_kings = 0
         self.valid_moves: list[Coordinate] = []
         self.marked_for_remove: dict[Coordinate, list[Coordinate]] = {}
+        # Every legal move of the last `get_valid_moves` piece by landing square
+        self.chains: dict[Coordinate, list[Play]] = {}
+        # Per board, so a search on another thread's copy never shares it
+        self._winners: dict[int, ColorType | str | None] = {}
 
         self.create_board()
 
     def set_valid_moves(self, valid_moves: list[Coordinate]):
         self.valid_moves = valid_moves
 
-    def draw_squares(self, win: pygame.Surface):
-        win.fill(Colors.DARK)
-
-        width = Dimensions.SQUARE_SIZE
-        height = Dimensions.SQUARE_SIZE
-        for row in range(Dimensions.ROW):
-            for col in range(row % 2, Dimensions.COL, 2):
-                pygame.draw.rect(
-                    win,
-                    Colors.LIGHT,
-                    (
-                        col * Dimensions.SQUARE_SIZE,
-                        row * Dimensions.SQUARE_SIZE,
-                        width,
-                        height
-                    )
-                )
-
-    def _draw_circle_alpha(
-        self,
-        win: pygame.Surface,
-        center: Coordinate,
-        radius: int,
-        color: tuple[int, int, int, int]
-    ):
-        target_rect = pygame.Rect(center, (0, 0)).inflate(
-            radius * 2, radius * 2)
-        shape_surface = pygame.Surface(target_rect.size, pygame.SRCALPHA)
-        pygame.draw.circle(shape_surface, color, (radius, radius), radius)
-        win.blit(shape_surface, target_rect)
-
-    def draw_valid_moves(self, win: pygame.Surface, valid_moves: list[Coordinate]):
-        half_square = Dimensions.SQUARE_SIZE // 2
-
-        for row, col in valid_moves:
-            x = col * Dimensions.SQUARE_SIZE + half_square
-            y = row * Dimensions.SQUARE_SIZE + half_square
-            pygame.draw.circle(win, (0, 200, 0), (x, y), 15)
-
     def create_board(self):
-        self.board: list[list[Piece | None]] = []
-        for row in range(Dimensions.ROW):
-            self.board.append([])
-            for col in range(Dimensions.COL):
-                if col % 2 == ((row + 1) % 2):
-                    if row < 5:
-                        self.board[row].append(Piece(row, col, Colors.RED))
-                    elif row > 6:
-                        self.board[row].append(Piece(row, col, Colors.WHITE))
-                    else:
-                        self.board[row].append(None)
-                else:
-                    self.board[row].append(None)
+        self.bitboard = Bitboard.initial()
+        self.hash = hash_bitboard(self.bitboard)
+        self._grid: list[list[Piece | None]] | None = None
+        self.red_left, self.white_left, self.red_kings, self.white_kings = \
+            self._count()
+
+    @property
+    def board(self) -> list[list[Piece | None]]:
+        if self._grid is None:
+            grid: list[list[Piece | None]] = [
+                [None] * Dimensions.COL for _ in range(Dimensions.ROW)
+            ]
+            for side in (RED, WHITE):
+                for square in squares(self.bitboard.pieces(side)):
+                    piece = self._make_piece(square, side)
+                    grid[piece.row][piece.col] = piece
+            self._grid = grid
+        return self._grid
+
+    @classmethod
+    def from_position(cls, position: Position, debug: bool = False) -> 'Board':
+        board = cls(debug)
+        board.bitboard = Bitboard.from_position(position)
+        board.hash = hash_bitboard(board.bitboard)
+        board.red_left, board.white_left, board.red_kings, board.white_kings = \
+            board._count()
+        return board
+
+    def position(self) -> Position:
+        return self.bitboard.position()
+
+    def counters(self) -> tuple[int, int, int, int]:
+        return self.red_left, self.white_left, self.red_kings, self.white_kings
+
+    def _count(self) -> tuple[int, int, int, int]:
+        """ Counters from a full rescan of the bitboard """
+
+        return (
+            self.bitboard.pieces(RED).bit_count(),
+            self.bitboard.pieces(WHITE).bit_count(),
+            self.bitboard.kings[RED].bit_count(),
+            self.bitboard.kings[WHITE].bit_count(),
+        )
+
+    def verify_counters(self):
+        expected = self._count()
+        if self.counters() != expected:
+            raise AssertionError(
+                f"Counters {self.counters()} do not match the board {expected}"
+            )
+
+    def __deepcopy__(self, memo: dict):
+        board = Board.__new__(Board)
+        board.debug = self.debug
+        board.selected_piece = deepcopy(self.selected_piece, memo)
+        board.red_left, board.white_left = self.red_left, self.white_left
+        board.red_kings, board.white_kings = self.red_kings, self.white_kings
+        board.valid_moves = self.valid_moves[:]
+        board.marked_for_remove = {
+            key: value[:] for key, value in self.marked_for_remove.items()
+        }
+        board.chains = {key: value[:] for key, value in self.chains.items()}
+        board.bitboard = self.bitboard.copy()
+        board.hash = self.hash
+        board._grid = None
+        board._winners = {}
+        return board
+
+    def _side(self, color: ColorType) -> int:
+        return RED if color == Colors.RED else WHITE
+
+    def _make_piece(self, square: int, side: int) -> Piece:
+        row, col = coordinate_of(square)
+        return Piece(row, col, SIDE_COLORS[side], self.bitboard.is_king(square))
 
     def get_piece(self, row: int, col: int) -> Piece | None:
-        return self.board[row][col]
+        if not -1 < row < Dimensions.ROW or not -1 < col < Dimensions.COL:
+            return None
+
+        square = square_of(row, col)
+        side = self.bitboard.side_at(square)
+        if side is None:
+            return None
+        return self._make_piece(square, side)
 
     def get_all_pieces(self, color: ColorType) -> list[Piece]:
-        pieces: list[Piece] = []
-        for row in range(Dimensions.ROW):
-            for col in range(Dimensions.COL):
-                piece = self.get_piece(row, col)
-                if piece is not None and piece.color == color:
-                    pieces.append(piece)
-        return pieces
+        side = self._side(color)
+        return [
+            self._make_piece(square, side)
+            for square in squares(self.bitboard.pieces(side))
+        ]
 
     def get_random(self):
         row = random.randint(0, Dimensions.ROW - 1)
@@ -97,7 +153,7 @@ class Board:
             row, col = self.get_random()
             piece = self.get_piece(row, col)
             if piece is not None and piece.color == color:
-                return self.board[row][col]
+                return piece
 
     def get_random_move(self, color: ColorType):
         piece = self.get_random_piece(color)
@@ -105,149 +161,146 @@ class Board:
             return None
         return self.get_valid_moves(piece)
 
-    def get_valid_moves(self, piece: Piece):
-        valid_moves: list[Coordinate] = []
-        self.marked_for_remove = {}
-
-        if piece.color == Colors.RED:
-            direction = Direction.DOWN
-            moves = self.adjacent_move(piece, direction)
-            valid_moves.extend(moves)
+    def _piece_moves(self, piece: Piece, direction: int | None = None):
+        valid: list[Coordinate] = []
+        for move in self.bitboard.piece_moves(square_of(piece.row, piece.col)):
+            row, col = coordinate_of(move.target)
+            if direction is not None and (row - piece.row) * direction < 0:
+                continue
+            self.chains.setdefault((row, col), []).append(self.bitboard.describe(move))
+            if (row, col) in valid:
+                continue
+
+            valid.append((row, col))
+            if move.captured:
+                self.marked_for_remove[(row, col)] = [
+                    coordinate_of(square) for square in squares(move.captured)
+                ]
 
-            if piece.king:
-                top = self.adjacent_move(piece, -direction)
-                valid_moves.extend(top)
-        else:
-            direction = Direction.UP
-            moves = self.adjacent_move(piece, direction)
-            valid_moves.extend(moves)
+        return valid
 
-            if piece.king:
-                bottom = self.adjacent_move(piece, -direction)
-                valid_moves.extend(bottom)
+    def get_valid_moves(self, piece: Piece):
+        """
+        Landing squares of `piece`. Capture chains taking different pieces
+        can end on the same square, so `chains` keeps all of them and
+        `marked_for_remove` only the first.
+        """
 
-        return valid_moves
+        self.marked_for_remove = {}
+        self.chains = {}
+        return self._piece_moves(piece)
 
     def adjacent_move(self, piece: Piece, direction: int):
-        valid: list[Coordinate] = []
-        row, col = piece.row, piece.col
-
-        if (direction == Direction.DOWN and row == Dimensions.ROW - 1) or (direction == Direction.UP and row == 0):
-            return valid
-
-        x = row + direction
-        if col == 0:
-            y = col + Direction.RIGHT
-            self._find_moves(piece, row, col, x, y, direction, valid)
-        elif col == Dimensions.COL - 1:
-            y = col + Direction.LEFT
-            self._find_moves(piece, row, col, x, y, direction, valid)
-        else:
-            y = col + Direction.RIGHT
-            self._find_moves(piece, row, col, x, y, direction, valid)
+        return [
+            (row, col) for row, col in self._piece_moves(piece, direction)
+            if abs(row - piece.row) == 1
+        ]
 
-            y = col + Direction.LEFT
-            self._find_moves(piece, row, col, x, y, direction, valid)
+    def jump(self, row: int, col: int, color: ColorType, direction: int):
+        piece = self.get_piece(row, col)
+        if piece is None or piece.color != color:
+            return []
+
+        return [
+            (x, y) for x, y in self._piece_moves(piece, direction)
+            if abs(x - row) > 1
+        ]
+
+    def get_moves(self, color: ColorType) -> list[Move]:
+        return self.bitboard.moves(self._side(color))
+
+    def get_captures(self, color: ColorType) -> list[Move]:
+        return self.bitboard.captures(self._side(color))
+
+    def make_move(self, move: Move) -> MoveRecord:
+        counters = self.counters()
+        undo = self.bitboard.apply(move)
+        self.hash ^= move_key(undo)
+        self._grid = None
+
+        if move.captured:
+            captured = move.captured.bit_count()
+            captured_kings = undo.captured_kings.bit_count()
+            if undo.side == WHITE:
+                self.red_left -= captured
+                self.red_kings -= captured_kings
+            else:
+                self.white_left -= captured
+                self.white_kings -= captured_kings
 
-        return valid
+        if undo.promoted:
+            if undo.side == WHITE:
+                self.white_kings += 1
+            else:
+                self.red_kings += 1
 
-    def _check_adjacent(self, row: int, col: int):
-        if not -1 < row < Dimensions.ROW or not -1 < col < Dimensions.COL:
-            return None
+        if self.debug:
+            self.verify_counters()
 
-        if self.board[row][col] is None:
-            return row, col
-        return None
-
-    def _find_moves(
-        self,
-        piece: Piece,
-        row: int,
-        col: int,
-        x: int,
-        y: int,
-        direction: int,
-        valid: list[Coordinate]
-    ):
-        if self._check_adjacent(x, y) is not None:
-            valid.append((x, y))
-        else:
-            cell = self.board[x][y]
-            if cell is not None and cell.color != piece.color:
-                jumps = self.jump(row, col, piece.color, direction)
-                valid.extend(jumps)
+        return MoveRecord(
+            coordinate_of(move.source),
+            coordinate_of(move.target),
+            [coordinate_of(square) for square in squares(move.captured)],
+            undo.promoted,
+            counters,
+            undo
+        )
 
-    def jump(self, row: int, col: int, color: ColorType, direction: int):
-        valid: list[Coordinate] = []
+    def describe(self, move: Move) -> Play:
+        return self.bitboard.describe(move)
 
-        if (direction == Direction.DOWN and row > Dimensions.ROW - 3) or (direction == Direction.UP and row < 2):
-            return valid
+    def play(self, play: Play) -> MoveRecord:
+        """ Apply a `Play`, e.g. one returned by the search or read back from a log """
 
-        if -1 < col < 2:
-            y_direction = Direction.RIGHT
-            self._find_jumps(row, col, color, direction, y_direction, valid)
-        elif Dimensions.COL - 3 < col < Dimensions.COL:
-            y_direction = Direction.LEFT
-            self._find_jumps(row, col, color, direction, y_direction, valid)
-        else:
-            y_direction = Direction.RIGHT
-            self._find_jumps(row, col, color, direction, y_direction, valid)
+        move = play.move()
+        side = self.bitboard.side_at(move.source)
+        if side is None or move not in self.bitboard.moves(side):
+            raise ValueError(f"Illegal move {play}")
+        return self.make_move(move)
 
-            y_direction = Direction.LEFT
-            self._find_jumps(row, col, color, direction, y_direction, valid)
+    def undo_move(self, record: MoveRecord):
+        self.bitboard.undo(record.undo)
+        self.hash ^= move_key(record.undo)
+        self._grid = None
 
-        return valid
+        self.red_left, self.white_left, self.red_kings, self.white_kings = \
+            record.counters
 
-    def _find_jumps(
-        self,
-        row: int,
-        col: int,
-        color: ColorType,
-        x_ditection: int,
-        y_direction: int,
-        valid: list[Coordinate]
-    ):
-        ax, ay = row + x_ditection, col + y_direction
-        jx, jy = row + x_ditection * 2, col + y_direction * 2
-
-        adjacent_cell = self.board[ax][ay]
-        if adjacent_cell is not None and adjacent_cell.color != color:
-            cell = self.board[jx][jy]
-            if cell is None:
-                valid.append((jx, jy))
-
-                if (row, col) in self.marked_for_remove:
-                    marked = self.marked_for_remove[(row, col)]
-                    marked.append((ax, ay))
-                    self.marked_for_remove[(jx, jy)] = marked
-                else:
-                    self.marked_for_remove[(jx, jy)] = [(ax, ay)]
-
-                r_jumps = self.jump(jx, jy, color, x_ditection)
-
-                valid.extend(r_jumps)
-
-    def move_piece(self, piece: Piece, row: int, col: int):
-        self.board[piece.row][piece.col] = self.board[row][col]
-        self.board[row][col] = piece
+        if self.debug:
+            self.verify_counters()
 
-        piece.move(row, col)
+    def move_piece(self, piece: Piece, row: int, col: int) -> MoveRecord:
+        """ The first chain to (row, col), use `play` with one of `chains` to pick another """
+
+        captured = 0
+        for item in self.marked_for_remove.get((row, col), []):
+            captured |= 1 << square_of(item[0], item[1])
 
-        if (row, col) in self.marked_for_remove:
-            for item in self.marked_for_remove[(row, col)]:
-                self.board[item[0]][item[1]] = None
+        record = self.make_move(
+            Move(square_of(piece.row, piece.col), square_of(row, col), captured)
+        )
 
-        if (row == 0 or row == Dimensions.ROW - 1) and not piece.king:
+        piece.move(row, col)
+        if record.promoted:
             piece.make_king()
 
-            if piece.color == Colors.WHITE:
-                self.white_kings += 1 if piece.king else 0
-            else:
-                self.red_kings += 1 if piece.king else 0
+        return record
 
     def remove_piece(self, piece: Piece):
-        row, col = piece.row, piece.col
-        self.board[row][col] = None
+        square = square_of(piece.row, piece.col)
+        side = self.bitboard.side_at(square)
+        if side is not None:
+            king = self.bitboard.is_king(square)
+            self.hash ^= PIECE_KEYS[side][king][square]
+            if side == WHITE:
+                self.white_left -= 1
+                self.white_kings -= king
+            else:
+                self.red_left -= 1
+                self.red_kings -= king
+
+        self.bitboard.remove(square)
+        self._grid = None
 
     def check_winner(self):
         if self.red_left == 0:
@@ -255,35 +308,32 @@ class Board:
         elif self.white_left == 0:
             return Colors.RED
 
-        white_pieces = self.get_all_pieces(Colors.WHITE)
-        red_pieces = self.get_all_pieces(Colors.RED)
+        winners = self._winners
+        if self.hash in winners:
+            return winners[self.hash]
 
-        white_valid_moves: list[Coordinate] = []
-        for piece in white_pieces:
-            white_valid_moves.extend(self.get_valid_moves(piece))
+        white_can_move = self.bitboard.has_moves(WHITE)
+        red_can_move = self.bitboard.has_moves(RED)
 
-        red_valid_moves: list[Coordinate] = []
-        for piece in red_pieces:
-            red_valid_moves.extend(self.get_valid_moves(piece))
-
-        if white_valid_moves == [] and red_valid_moves == []:
-            return "draw"
-        elif white_valid_moves == []:
-            return Colors.RED
-        elif red_valid_moves == []:
-            return Colors.WHITE
+        if not white_can_move and not red_can_move:
+            winner = "draw"
+        elif not white_can_move:
+            winner = Colors.RED
+        elif not red_can_move:
+            winner = Colors.WHITE
+        else:
+            winner = None
 
-        return None
+        if len(winners) >= WINNER_CACHE_SIZE:
+            winners.clear()
+        winners[self.hash] = winner
+        return winner
 
     def evaluate(self) -> float:
-        return (self.white_left - self.red_left) + (self.white_kings - self.red_kings) * 0.5
-
-    def draw(self, win: pygame.Surface):
-        self.draw_squares(win)
-        self.draw_valid_moves(win, self.valid_moves)
+        """ Material and mobility from red's side, as red is the maximising player """
 
-        for row in range(Dimensions.ROW):
-            for col in range(Dimensions.COL):
-                piece = self.board[row][col]
-                if piece is not None:
-                    piece.draw(win)
+        material = (self.red_left - self.white_left) + (self.red_kings - self.white_kings) * 0.5
+        # Simple moves only, so no capture chains are built at a leaf
+        empty = self.bitboard.empty
+        mobility = self.bitboard.count_steps(RED, empty) - self.bitboard.count_steps(WHITE, empty)
+        return material + mobility * MOBILITY_WEIGHT
@@ -1,14 +1,12 @@
 from enum import IntEnum
 from typing import ClassVar
 
-from pygame import color
-
 
 Coordinate = tuple[int, int]
-ColorType = color.Color \
+# Plain RGB tuples, which pygame accepts anywhere it takes a colour
+ColorType = tuple[int, int, int] \
     | int \
     | str \
-    | tuple[int, int, int] \
     | list[int]
 
 
@@ -20,22 +18,22 @@ class Direction(IntEnum):
 
 
 class Colors:
-    # RED: ClassVar = color.Color(255, 000, 000)
-    RED: ClassVar = color.Color('#F21905')
-    BLUE: ClassVar = color.Color(000, 000, 255)
-    # DARK: ClassVar = color.Color(218, 160, 109)
-    DARK: ClassVar = color.Color('#608C1F')
-    BLACK: ClassVar = color.Color(000, 000, 000)
-    # BROWN: ClassVar = color.Color(128, 128, 128)
-    BROWN: ClassVar = color.Color('#730202')
-    GREEN: ClassVar = color.Color(000, 255, 000)
-    # LIGHT: ClassVar = color.Color(128, 128, 000)
-    LIGHT: ClassVar = color.Color('#F2E3B6')
-    # WHITE: ClassVar = color.Color(255, 255, 255)
-    WHITE: ClassVar = color.Color('#F2F2F2')
-    ORANGE: ClassVar = color.Color(255, 128, 000)
-    PURPLE: ClassVar = color.Color(128, 000, 128)
-    YELLOW: ClassVar = color.Color(255, 255, 000)
+    # RED: ClassVar = (255, 000, 000)
+    RED: ClassVar = (0xF2, 0x19, 0x05)
+    BLUE: ClassVar = (000, 000, 255)
+    # DARK: ClassVar = (218, 160, 109)
+    DARK: ClassVar = (0x60, 0x8C, 0x1F)
+    BLACK: ClassVar = (000, 000, 000)
+    # BROWN: ClassVar = (128, 128, 128)
+    BROWN: ClassVar = (0x73, 0x02, 0x02)
+    GREEN: ClassVar = (000, 255, 000)
+    # LIGHT: ClassVar = (128, 128, 000)
+    LIGHT: ClassVar = (0xF2, 0xE3, 0xB6)
+    # WHITE: ClassVar = (255, 255, 255)
+    WHITE: ClassVar = (0xF2, 0xF2, 0xF2)
+    ORANGE: ClassVar = (255, 128, 000)
+    PURPLE: ClassVar = (128, 000, 128)
+    YELLOW: ClassVar = (255, 255, 000)
 
 
 class Dimensions:
@@ -4,8 +4,18 @@ import logging
 import pygame
 
 from ai.algorithm import Algorithm
+from ai.book import OpeningBook
+from ai.tablebase import open_default
+from ai.worker import SearchWorker
+from checker.bitboard import Play, Position
 from checker.board import Board
 from checker.constants import Colors, Coordinate, Dimensions
+from checker.geometry import coordinate_of, square_of
+from checker.render import Renderer
+
+
+# Posted by the search thread to wake the event loop
+AI_DONE = pygame.event.custom_type()
 
 
 def get_row_col_from_mouse_pos(mouse_pos: tuple[float, float]) -> Coordinate:
@@ -21,11 +31,18 @@ def get_row_col_from_mouse_pos(mouse_pos: tuple[float, float]) -> Coordinate:
 class Game:
     """ Game class """
 
-    def __init__(self, window: pygame.Surface):
-        """ Initialize the game """
+    def __init__(self, window: pygame.Surface, time_budget: int = 1000):
+        """ Initialize the game, `time_budget` is the AI's time per move in ms """
 
-        self.algorithm = Algorithm()
+        self.algorithm = Algorithm(tablebase=open_default())
+        self.book = OpeningBook()
+        self.worker = SearchWorker(
+            self.algorithm, on_done=lambda: pygame.event.post(pygame.event.Event(AI_DONE))
+        )
+        self.time_budget = time_budget
         self.window = window
+        self.renderer = Renderer(window)
+        self.running = False
         self.ai = Colors.RED
         self.human = Colors.WHITE
 
@@ -34,37 +51,53 @@ class Game:
         self.logger = logging.getLogger(__name__)
         self.logger.info('Game is successfully initialized')
 
-    def run(self, FPS: int = 60):
-        run = True
-        clock = pygame.time.Clock()
+    def run(self, FPS: int = 60, idle_timeout: int = 1000):
+        """
+        Draw only when the game changed, at most `FPS` times a second, and
+        otherwise sleep until an event arrives or `idle_timeout` ms pass.
+        """
 
-        while run:
-            clock.tick(FPS)
+        clock = pygame.time.Clock()
+        self.running = True
+        # Nothing reacts to the pointer moving, so it should not wake the loop
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
 
+        while self.running:
             if self.current_player == self.ai:
-                self.ai_move(self.board)
-                self.logger.info("AI moved.")
+                self.poll_ai()
 
+            if self.dirty:
+                self.play()
+                clock.tick(FPS)
+
+            # The AI search posts AI_DONE, so waiting does not delay its move
+            self.handle_event(pygame.event.wait(idle_timeout))
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    run = False
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    row, col = get_row_col_from_mouse_pos(event.pos)
+                self.handle_event(event)
 
-                    if pygame.mouse.get_pressed()[2]:
-                        self.select_piece(row, col)
-                    if pygame.mouse.get_pressed()[0]:
-                        self.move_piece(row, col)
+        self.logger.info(f"Rendering: {self.renderer.frames.summary()}")
+        self.worker.cancel()
+        pygame.quit()
 
-            self.play()
+    def handle_event(self, event: pygame.event.Event):
+        if event.type == pygame.QUIT:
+            self.running = False
+        elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            self.renderer.invalidate()
+            self.refresh()
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            row, col = get_row_col_from_mouse_pos(event.pos)
 
-        pygame.quit()
+            if pygame.mouse.get_pressed()[2]:
+                self.select_piece(row, col)
+            if pygame.mouse.get_pressed()[0]:
+                self.move_piece(row, col)
 
     def play(self):
-        """ Play the game """
+        """ Draw the changes since the last frame """
 
-        self.board.draw(self.window)
-        pygame.display.update()
+        self.renderer.update(self.board)
+        self.dirty = False
 
     def switch_player(self):
         """ Switch the current player """
@@ -74,64 +107,170 @@ class Game:
         else:
             self.current_player = self.human
 
+    def accepts_input(self) -> bool:
+        """ Whether it is the human's turn and no AI search is still running """
+
+        return self.current_player == self.human and not self.worker.busy
+
     def select_piece(self, row: int, col: int):
         """ Select a piece """
 
+        if not self.accepts_input():
+            return
+
         piece = self.board.get_piece(row, col)
         if piece is None:
             return
 
         if piece.color == self.current_player:
             self.selected_piece = piece
+            self.chain_choices, self.chain_path = [], []
             self.valid_moves = self.board.get_valid_moves(piece)
 
             self.board.set_valid_moves(self.valid_moves)
             self.refresh()
         else:
-            self.selected_piece = None
-            self.valid_moves = []
-            self.board.set_valid_moves(self.valid_moves)
-            self.refresh()
+            self._clear_selection()
 
     def move_piece(self, row: int, col: int):
         """ Move a piece """
 
-        if self.selected_piece is None:
+        if self.selected_piece is None or not self.accepts_input():
             return
 
-        if (row, col) in self.valid_moves:
-            self.board.move_piece(self.selected_piece, row, col)
-            self.selected_piece = None
-            self.valid_moves = []
-            self.board.set_valid_moves(self.valid_moves)
-            self.switch_player()
-            self.winner = self.board.check_winner()
+        if self.chain_choices:
+            self._choose_chain(square_of(row, col))
+        elif (row, col) in self.valid_moves:
+            chains = self.board.chains.get((row, col), [])
+            if len(chains) > 1:
+                self.chain_choices, self.chain_path = chains, []
+                self._choose_chain(None)
+                return
 
-            self.refresh()
+            self.board.move_piece(self.selected_piece, row, col)
+            self._finish_move()
         else:
-            self.selected_piece = None
-            self.valid_moves = []
-            self.board.set_valid_moves(self.valid_moves)
-            self.refresh()
+            self._clear_selection()
+
+    def _choose_chain(self, square: int | None):
+        """
+        Narrow down capture chains that end on the same square: the player
+        clicks their landing squares in order until one chain is left, or
+        the square a chain ends on a second time to stop there.
+        """
+
+        path = self.chain_path
+        if square is not None:
+            ending = [play for play in self.chain_choices if list(play.path) == path]
+            if ending and path and square == path[-1]:
+                self.board.play(ending[0])
+                self._finish_move()
+                return
+
+            self.chain_choices = [
+                play for play in self.chain_choices
+                if len(play.path) > len(path) and play.path[len(path)] == square
+            ]
+            path.append(square)
+
+        while True:
+            if not self.chain_choices:
+                self._clear_selection()
+                return
+            if len(self.chain_choices) == 1:
+                self.board.play(self.chain_choices[0])
+                self._finish_move()
+                return
+
+            ending = any(list(play.path) == path for play in self.chain_choices)
+            squares = {
+                play.path[len(path)] for play in self.chain_choices if len(play.path) > len(path)
+            }
+            if ending or len(squares) > 1:
+                break
+            # Every chain goes on to the same square, no need to ask
+            path.append(squares.pop())
+
+        options = sorted(squares | ({path[-1]} if ending else set()))
+        self.valid_moves = [coordinate_of(square) for square in options]
+        self.board.set_valid_moves(self.valid_moves)
+        self.refresh()
+
+    def _finish_move(self):
+        self.switch_player()
+        self.winner = self.board.check_winner()
+        self._clear_selection()
+
+    def _clear_selection(self):
+        self.selected_piece = None
+        self.chain_choices, self.chain_path = [], []
+        self.valid_moves = []
+        self.board.set_valid_moves(self.valid_moves)
+        self.refresh()
+
+    def poll_ai(self):
+        """ Start the AI search in the background, or play its move once done """
+
+        if not self.worker.busy:
+            root = self.worker.root
+            result = self.worker.poll()
+            if result is None:
+                if self._book_move(self.board):
+                    return
+                self.logger.info("AI is making a move.")
+                self.worker.start(self.board, True, self.time_budget)
+                return
+
+            self._apply_ai_move(*result, root=root)
 
     def ai_move(self, board: Board):
-        """ AI move """
+        """ AI move, searched on the calling thread """
+
+        if self._book_move(board):
+            return
 
         self.logger.info("AI is making a move.")
-        value, new_board = self.algorithm.alpha_beta(
-            board, 3, True, float("-inf"), float("inf")
+        result = self.algorithm.iterative_deepening(
+            board, True, self.time_budget
         )
-        self.logger.info(f"AI value: {value}")
+        self._apply_ai_move(*result)
+
+    def _book_move(self, board: Board) -> bool:
+        """ Play from the opening book while the position is in it """
+
+        play = self.book.choose(board, self.ai)
+        if play is None:
+            return False
+
+        self.logger.info("AI plays from the opening book.")
+        self._apply_ai_move(0.0, play, 0)
+        return True
+
+    def _apply_ai_move(
+        self,
+        value: float,
+        play: Play | None,
+        depth: int,
+        root: Position | None = None
+    ):
+        """ A result searched from `root` is dropped if the board has moved on since """
+
+        if root is not None and root != self.board.position():
+            self.logger.warning(f"Dropped AI move {play} searched from an outdated position.")
+            return
+
+        self.logger.info(f"AI value: {value} at depth {depth}")
 
-        if new_board is not None:
-            self.board = new_board
+        if play is not None:
+            self.board.play(play)
+            self.logger.info(f"AI moved {play}.")
 
         self.selected_piece = None
         self.valid_moves = []
         self.board.set_valid_moves(self.valid_moves)
 
         self.switch_player()
-        self.winner = board.check_winner()
+        self.winner = self.board.check_winner()
 
         self.refresh()
 
@@ -141,10 +280,9 @@ class Game:
         return self.board.evaluate()
 
     def refresh(self):
-        """ Refresh the game window """
+        """ Redraw on the next frame, however many times it is asked for before """
 
-        self.board.draw(self.window)
-        pygame.display.update()
+        self.dirty = True
 
     def reset(self):
         """ Reset the game """
@@ -152,8 +290,13 @@ class Game:
         self._reset()
 
     def _reset(self):
+        self.worker.cancel()
         self.board = Board()
         self.current_player = self.human
         self.selected_piece = None
         self.valid_moves = []
+        # Capture chains the player is still choosing between, and the landings clicked
+        self.chain_choices: list[Play] = []
+        self.chain_path: list[int] = []
         self.winner = None
+        self.dirty = True
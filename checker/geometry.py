@@ -0,0 +1,121 @@
+""" Lookup tables for the board geometry, built once from Dimensions """
+from checker.constants import Dimensions
+
+
+# Diagonal directions: down-left, down-right, up-left, up-right
+DELTAS = ((1, -1), (1, 1), (-1, -1), (-1, 1))
+ALL_DIRECTIONS = (0, 1, 2, 3)
+# Men of each side only move and capture forward: red down, white up
+FORWARD = ((0, 1), (2, 3))
+
+# Piece kinds that index the per-square tables: red man, white man, king
+RED_MAN, WHITE_MAN, KING = 0, 1, 2
+KIND_DIRECTIONS = (FORWARD[0], FORWARD[1], ALL_DIRECTIONS)
+
+
+class Geometry:
+    """
+    Squares are numbered row * cols + col, so a diagonal step is a fixed
+    offset and the tables hold plain square indices for any board size.
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+
+        self.playable = self.mask()
+        # Dark squares in board order, numbered from 0 by their position here
+        self.dark = tuple(square for square in range(self.size) if self.playable >> square & 1)
+        self.steps = tuple(dr * cols + dc for dr, dc in DELTAS)
+        self.step_sources = tuple(self.mask(dr, dc) for dr, dc in DELTAS)
+        self.jump_sources = tuple(self.mask(dr * 2, dc * 2) for dr, dc in DELTAS)
+
+        # [square][direction] -> neighbour / landing square, None off the board
+        self.neighbours = tuple(
+            tuple(self._offset(square, dr, dc) for dr, dc in DELTAS)
+            for square in range(self.size)
+        )
+        self.landings = tuple(
+            tuple(self._offset(square, dr * 2, dc * 2) for dr, dc in DELTAS)
+            for square in range(self.size)
+        )
+
+        # [kind][square] -> only the steps and (over, landing) jumps on the board
+        self.step_targets = tuple(
+            tuple(
+                tuple(
+                    self.neighbours[square][direction] for direction in directions
+                    if self.neighbours[square][direction] is not None
+                )
+                for square in range(self.size)
+            )
+            for directions in KIND_DIRECTIONS
+        )
+        self.jump_targets = tuple(
+            tuple(
+                tuple(
+                    (self.neighbours[square][direction], self.landings[square][direction])
+                    for direction in directions
+                    if self.landings[square][direction] is not None
+                )
+                for square in range(self.size)
+            )
+            for directions in KIND_DIRECTIONS
+        )
+
+        self.promotion = (self.row_mask(rows - 1), self.row_mask(0))
+
+        # Each side fills the rows on its half but the two middle ones
+        home_rows = (rows - 2) // 2
+        self.start = (
+            sum(self.row_mask(row) for row in range(home_rows)),
+            sum(self.row_mask(row) for row in range(rows - home_rows, rows)),
+        )
+
+    def square(self, row: int, col: int) -> int:
+        return row * self.cols + col
+
+    def _offset(self, square: int, row_step: int, col_step: int) -> int | None:
+        row, col = divmod(square, self.cols)
+        if (row + col) % 2 == 0:
+            return None
+        if -1 < row + row_step < self.rows and -1 < col + col_step < self.cols:
+            return self.square(row + row_step, col + col_step)
+        return None
+
+    def mask(self, row_step: int = 0, col_step: int = 0) -> int:
+        """ Dark squares from which a (row_step, col_step) offset stays on the board """
+
+        bits = 0
+        for square in range(self.size):
+            if self._offset(square, row_step, col_step) is not None:
+                bits |= 1 << square
+        return bits
+
+    def row_mask(self, row: int) -> int:
+        return self.playable & (((1 << self.cols) - 1) << self.square(row, 0))
+
+
+GEOMETRY = Geometry(Dimensions.ROW, Dimensions.COL)
+
+SQUARES = GEOMETRY.size
+BOARD_MASK = (1 << SQUARES) - 1
+PLAYABLE = GEOMETRY.playable
+DARK = GEOMETRY.dark
+ORDINAL = {square: ordinal for ordinal, square in enumerate(DARK)}
+STEPS = GEOMETRY.steps
+STEP_SOURCES = GEOMETRY.step_sources
+JUMP_SOURCES = GEOMETRY.jump_sources
+STEP_TARGETS = GEOMETRY.step_targets
+JUMP_TARGETS = GEOMETRY.jump_targets
+PROMOTION = GEOMETRY.promotion
+START = GEOMETRY.start
+
+
+def square_of(row: int, col: int) -> int:
+    return row * Dimensions.COL + col
+
+
+def coordinate_of(square: int) -> tuple[int, int]:
+    return divmod(square, Dimensions.COL)
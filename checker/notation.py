@@ -0,0 +1,149 @@
+"""
+Text notation for positions, moves and games, in the style of PDN's FEN.
+
+Dark squares are numbered 1 to 72 row by row from red's side, so red
+starts on 1-30 and white on 43-72. A position is the side to move
+followed by each side's pieces, kings prefixed with K and runs of men
+written as ranges:
+
+    W:W43-72:R1-30
+
+A step is written `from-to` and a capture as every square landed on,
+`from x over ... x to`. A game is its start position, its moves and the
+winner (`red`, `white`, `draw` or `*` when unknown) on one line.
+"""
+from typing import NamedTuple
+
+from checker.bitboard import RED, WHITE, Bitboard, Move, Play, Position, squares
+from checker.constants import Colors, ColorType
+from checker.geometry import DARK, ORDINAL
+
+
+SIDE_LETTERS = ('R', 'W')
+WINNERS = ('red', 'white', 'draw')
+
+
+def winner_name(winner: ColorType | str | None) -> str | None:
+    """ The entry of `WINNERS` for a `Board.check_winner` result """
+
+    if winner is None or winner == 'draw':
+        return winner
+    return 'red' if winner == Colors.RED else 'white'
+
+
+class GameRecord(NamedTuple):
+    """ A game as played: white moves first from the start position unless given """
+
+    moves: tuple[Move, ...]
+    winner: str | None = None
+    start: Position = Bitboard.initial().position()
+    side: int = WHITE
+
+
+def _numbers(men: int, kings: int) -> str:
+    tokens = []
+    run: list[int] = []
+    for number in sorted(ORDINAL[square] + 1 for square in squares(men)) + [0]:
+        if run and number == run[-1] + 1:
+            run.append(number)
+            continue
+        if run:
+            tokens.append(f"{run[0]}-{run[-1]}" if len(run) > 2 else ','.join(map(str, run)))
+        run = [number]
+    tokens.extend(f"K{ORDINAL[square] + 1}" for square in squares(kings))
+    return ','.join(tokens)
+
+
+def format_position(position: Position, side: int) -> str:
+    return (
+        f"{SIDE_LETTERS[side]}"
+        f":W{_numbers(position.white_men, position.white_kings)}"
+        f":R{_numbers(position.red_men, position.red_kings)}"
+    )
+
+
+def _square(token: str) -> int:
+    number = int(token)
+    if not 0 < number <= len(DARK):
+        raise ValueError(f"No square {number}")
+    return DARK[number - 1]
+
+
+def parse_position(text: str) -> tuple[Position, int]:
+    """ Position and side to move of a `format_position` string """
+
+    turn, *fields = text.strip().split(':')
+    if turn not in SIDE_LETTERS or len(fields) != 2:
+        raise ValueError(f"Not a position: {text!r}")
+
+    men, kings = [0, 0], [0, 0]
+    for field in fields:
+        side = SIDE_LETTERS.index(field[:1]) if field[:1] in SIDE_LETTERS else None
+        if side is None:
+            raise ValueError(f"Not a position: {text!r}")
+
+        for token in filter(None, field[1:].split(',')):
+            if token.startswith('K'):
+                kings[side] |= 1 << _square(token[1:])
+            elif '-' in token:
+                first, last = map(int, token.split('-'))
+                for number in range(first, last + 1):
+                    men[side] |= 1 << _square(str(number))
+            else:
+                men[side] |= 1 << _square(token)
+
+    if (men[RED] | kings[RED]) & (men[WHITE] | kings[WHITE]) or men[RED] & kings[RED] \
+            or men[WHITE] & kings[WHITE]:
+        raise ValueError(f"Squares are used twice in {text!r}")
+    return Position(men[RED], men[WHITE], kings[RED], kings[WHITE]), SIDE_LETTERS.index(turn)
+
+
+def format_play(play: Play) -> str:
+    separator = 'x' if play.captured else '-'
+    return separator.join(str(ORDINAL[square] + 1) for square in (play.source, *play.path))
+
+
+def parse_play(bitboard: Bitboard, side: int, text: str) -> Move:
+    """ The legal move of `side` that `text` spells, landing squares and all """
+
+    separator = 'x' if 'x' in text else '-'
+    source, *path = (_square(token) for token in text.split(separator))
+    if not path:
+        raise ValueError(f"Illegal move {text}")
+
+    for move in bitboard.moves(side):
+        if move.source == source and move.target == path[-1] \
+                and bool(move.captured) == (separator == 'x') \
+                and bitboard.describe(move).path == tuple(path):
+            return move
+    raise ValueError(f"Illegal move {text}")
+
+
+def format_game(record: GameRecord) -> str:
+    bitboard = Bitboard.from_position(record.start)
+    side = record.side
+    tokens = [format_position(record.start, side)]
+    for move in record.moves:
+        tokens.append(format_play(bitboard.describe(move)))
+        bitboard.apply(move)
+        side = 1 - side
+    tokens.append(record.winner or '*')
+    return ' '.join(tokens)
+
+
+def parse_game(text: str) -> GameRecord:
+    start_text, *tokens = text.split()
+    if not tokens:
+        raise ValueError(f"Not a game: {text!r}")
+    *move_texts, result = tokens
+    if result not in WINNERS and result != '*':
+        raise ValueError(f"Unknown result {result}")
+
+    start, side = parse_position(start_text)
+    bitboard = Bitboard.from_position(start)
+    moves = []
+    for ply, move_text in enumerate(move_texts):
+        move = parse_play(bitboard, (side + ply) % 2, move_text)
+        bitboard.apply(move)
+        moves.append(move)
+    return GameRecord(tuple(moves), None if result == '*' else result, start, side)
@@ -0,0 +1,109 @@
+""" Perft: count the leaf nodes of the move tree to verify move generation """
+import argparse
+import time
+
+from checker.bitboard import RED, WHITE, Bitboard, Move, Position
+from checker.zobrist import SIDE_KEYS, hash_bitboard, move_key
+
+
+# Subtrees at least this deep are cached by (hash, depth)
+CACHE_DEPTH = 3
+
+
+class Perft:
+    def __init__(self, bitboard: Bitboard, bulk: bool = True, cache: bool = True):
+        """
+        `bulk` counts the moves at the last ply instead of playing them,
+        `cache` reuses the count of positions reached by different orders.
+        """
+
+        self.bitboard = bitboard
+        self.bulk = bulk
+        self.cache: dict[tuple[int, int], int] | None = {} if cache else None
+        self.hash = hash_bitboard(bitboard)
+
+    def count(self, side: int, depth: int) -> int:
+        if depth == 0:
+            return 1
+        if depth == 1 and self.bulk:
+            return self.bitboard.count_moves(side)
+
+        key = (self.hash ^ SIDE_KEYS[side], depth)
+        if self.cache is not None and depth >= CACHE_DEPTH:
+            nodes = self.cache.get(key)
+            if nodes is not None:
+                return nodes
+
+        nodes = 0
+        for move in self.bitboard.moves(side):
+            nodes += self._child(move, side, depth)
+
+        if self.cache is not None and depth >= CACHE_DEPTH:
+            self.cache[key] = nodes
+        return nodes
+
+    def _child(self, move: Move, side: int, depth: int) -> int:
+        undo = self.bitboard.apply(move)
+        delta = move_key(undo)
+        self.hash ^= delta
+
+        nodes = self.count(1 - side, depth - 1)
+
+        self.hash ^= delta
+        self.bitboard.undo(undo)
+        return nodes
+
+    def divide(self, side: int, depth: int) -> list[tuple[Move, int]]:
+        """ Leaf count below each root move """
+
+        if depth == 0:
+            return []
+        return [
+            (move, self._child(move, side, depth))
+            for move in self.bitboard.moves(side)
+        ]
+
+
+def perft(bitboard: Bitboard, side: int, depth: int, bulk: bool = True) -> int:
+    return Perft(bitboard, bulk).count(side, depth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count move tree leaves per depth')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--side', choices=('red', 'white'), default='white')
+    parser.add_argument(
+        '--position',
+        help='red men, white men, red kings and white kings masks as hex, comma separated'
+    )
+    parser.add_argument('--divide', action='store_true', help='break the count down by root move')
+    parser.add_argument('--no-bulk', action='store_true', help='play out the last ply too')
+    parser.add_argument('--no-cache', action='store_true', help='do not reuse transposed subtrees')
+    args = parser.parse_args()
+
+    if args.position:
+        bitboard = Bitboard.from_position(
+            Position(*(int(mask, 16) for mask in args.position.split(',')))
+        )
+    else:
+        bitboard = Bitboard.initial()
+    side = RED if args.side == 'red' else WHITE
+
+    counter = Perft(bitboard, not args.no_bulk, not args.no_cache)
+    if args.divide:
+        total = 0
+        for move, nodes in counter.divide(side, args.depth):
+            total += nodes
+            print(f"{str(bitboard.describe(move)):>12} {nodes}")
+        print(f"{'total':>12} {total}")
+        return
+
+    for depth in range(1, args.depth + 1):
+        start = time.perf_counter()
+        nodes = counter.count(side, depth)
+        seconds = time.perf_counter() - start
+        print(f"depth {depth:>2} {nodes:>14} nodes {seconds:>9.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,17 @@
-from dataclasses import dataclass, field
-from typing import ClassVar
+from dataclasses import dataclass
 
-from pygame import draw, image, surface, transform
+from checker.constants import ColorType
 
-from checker.constants import ColorType, Dimensions
 
-
-@dataclass
+@dataclass(slots=True)
 class Piece:
-    CROWN: ClassVar = transform.scale(
-        image.load('assets/images/crown.png'),
-        (Dimensions.SQUARE_SIZE // 3, Dimensions.SQUARE_SIZE // 3)
-    )
+    """ Board square and kind only, the renderer works out where it goes on screen """
 
     row: int
     col: int
+    # One of the shared `Colors` tuples, never copied
     color: ColorType
-
-    x: int = field(default=0, init=False)
-    y: int = field(default=0, init=False)
-    king: bool = field(default=False, init=False)
-
-    def __post_init__(self):
-        self.calculate_positions()
+    king: bool = False
 
     def __repr__(self) -> str:
         return f"Piece({self.row}, {self.col}, {self.color}, {self.king})"
@@ -30,25 +19,15 @@ class Piece:
     def __str__(self) -> str:
         return f"{str(self.color)} -> ({str(self.row)}, {str(self.col)}) -> {'King' if self.king else 'Man'}"
 
+    def __copy__(self) -> 'Piece':
+        return Piece(self.row, self.col, self.color, self.king)
+
+    def __deepcopy__(self, memo: dict) -> 'Piece':
+        return Piece(self.row, self.col, self.color, self.king)
+
     def make_king(self):
         self.king = True
 
-    def calculate_positions(self):
-        half_square = Dimensions.SQUARE_SIZE // 2
-        self.x = self.col * Dimensions.SQUARE_SIZE + half_square
-        self.y = self.row * Dimensions.SQUARE_SIZE + half_square
-
     def move(self, row: int, col: int):
         self.row = row
         self.col = col
-        self.calculate_positions()
-
-    def draw(self, win: surface.Surface):
-        draw.circle(win, self.color, (self.x, self.y), 20)
-
-        if self.king:
-            win.blit(
-                Piece.CROWN,
-                (self.x - Piece.CROWN.get_width() // 2,
-                 self.y - Piece.CROWN.get_height() // 2)
-            )
@@ -0,0 +1,205 @@
+""" Pygame rendering of a Board, kept apart from the headless engine """
+import time
+from collections import deque
+
+import pygame
+
+from checker.bitboard import Position, squares
+from checker.board import SIDE_COLORS, Board
+from checker.constants import Colors, Coordinate, Dimensions
+from checker.geometry import coordinate_of, square_of
+from checker.piece import Piece
+
+
+PIECE_RADIUS = 20
+MARKER_RADIUS = 15
+MARKER_COLOR = (0, 200, 0)
+
+
+class FrameTimer:
+    """ Time spent rendering over the last `window` frames """
+
+    def __init__(self, window: int = 120):
+        self.times: deque[float] = deque(maxlen=window)
+        self.frames = 0
+        # Frames where nothing changed and nothing was drawn
+        self.idle = 0
+
+    def record(self, seconds: float, drawn: bool):
+        self.times.append(seconds)
+        self.frames += 1
+        if not drawn:
+            self.idle += 1
+
+    @property
+    def mean_ms(self) -> float:
+        return sum(self.times) / len(self.times) * 1000 if self.times else 0.0
+
+    @property
+    def worst_ms(self) -> float:
+        return max(self.times, default=0.0) * 1000
+
+    def summary(self) -> str:
+        return (
+            f"{self.frames} frames, {self.idle} idle, "
+            f"{self.mean_ms:.3f} ms mean, {self.worst_ms:.3f} ms worst"
+        )
+
+
+class Renderer:
+    """
+    Draws the board from a background and piece sprites rendered once. After
+    the first frame only the squares whose piece or move marker changed are
+    redrawn, and `update` pushes just those rectangles to the display.
+    """
+
+    def __init__(self, window: pygame.Surface):
+        self.window = window
+        self.crown = pygame.transform.scale(
+            pygame.image.load('assets/images/crown.png'),
+            (Dimensions.SQUARE_SIZE // 3, Dimensions.SQUARE_SIZE // 3)
+        )
+        self.background = self._render_background()
+        # One sprite per `Position` field: red men, white men, red kings, white kings
+        self.sprites = tuple(
+            self._render_piece(SIDE_COLORS[kind % 2], kind >= 2) for kind in range(4)
+        )
+        self.frames = FrameTimer()
+        # Position and move markers on screen, None when the window needs a full redraw
+        self._drawn: tuple[Position, frozenset[Coordinate]] | None = None
+
+    def _render_background(self) -> pygame.Surface:
+        surface = pygame.Surface(self.window.get_size()).convert()
+        surface.fill(Colors.DARK)
+
+        width = Dimensions.SQUARE_SIZE
+        height = Dimensions.SQUARE_SIZE
+        for row in range(Dimensions.ROW):
+            for col in range(row % 2, Dimensions.COL, 2):
+                pygame.draw.rect(
+                    surface,
+                    Colors.LIGHT,
+                    (
+                        col * Dimensions.SQUARE_SIZE,
+                        row * Dimensions.SQUARE_SIZE,
+                        width,
+                        height
+                    )
+                )
+        return surface
+
+    def _render_piece(self, color, king: bool) -> pygame.Surface:
+        size = Dimensions.SQUARE_SIZE
+        surface = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+        pygame.draw.circle(surface, color, (size // 2, size // 2), PIECE_RADIUS)
+
+        if king:
+            surface.blit(self.crown, self.crown.get_rect(center=(size // 2, size // 2)))
+        return surface
+
+    @staticmethod
+    def square_rect(row: int, col: int) -> pygame.Rect:
+        return pygame.Rect(
+            col * Dimensions.SQUARE_SIZE,
+            row * Dimensions.SQUARE_SIZE,
+            Dimensions.SQUARE_SIZE,
+            Dimensions.SQUARE_SIZE
+        )
+
+    def invalidate(self):
+        """ Redraw the whole window next time, after something else drew over it """
+
+        self._drawn = None
+
+    def draw_squares(self):
+        self.window.blit(self.background, (0, 0))
+
+    def _draw_circle_alpha(
+        self,
+        center: Coordinate,
+        radius: int,
+        color: tuple[int, int, int, int]
+    ):
+        target_rect = pygame.Rect(center, (0, 0)).inflate(
+            radius * 2, radius * 2)
+        shape_surface = pygame.Surface(target_rect.size, pygame.SRCALPHA)
+        pygame.draw.circle(shape_surface, color, (radius, radius), radius)
+        self.window.blit(shape_surface, target_rect)
+
+    def draw_valid_moves(self, valid_moves: list[Coordinate]):
+        half_square = Dimensions.SQUARE_SIZE // 2
+
+        for row, col in valid_moves:
+            x = col * Dimensions.SQUARE_SIZE + half_square
+            y = row * Dimensions.SQUARE_SIZE + half_square
+            pygame.draw.circle(self.window, MARKER_COLOR, (x, y), MARKER_RADIUS)
+
+    def draw_piece(self, piece: Piece):
+        kind = SIDE_COLORS.index(piece.color) + (2 if piece.king else 0)
+        self.window.blit(self.sprites[kind], self.square_rect(piece.row, piece.col))
+
+    def _draw_square(self, position: Position, markers: frozenset[Coordinate], square: int) -> pygame.Rect:
+        row, col = coordinate_of(square)
+        rect = self.square_rect(row, col)
+        self.window.blit(self.background, rect, rect)
+
+        if (row, col) in markers:
+            self.draw_valid_moves([(row, col)])
+        for kind, mask in enumerate(position):
+            if mask >> square & 1:
+                self.window.blit(self.sprites[kind], rect)
+        return rect
+
+    def draw(self, board: Board) -> list[pygame.Rect]:
+        """ Bring the window up to date with `board`, returning the rectangles drawn """
+
+        position = board.position()
+        markers = frozenset(board.valid_moves)
+
+        if self._drawn is None:
+            self.draw_squares()
+            self.draw_valid_moves(list(markers))
+            for kind, mask in enumerate(position):
+                for square in squares(mask):
+                    row, col = coordinate_of(square)
+                    self.window.blit(self.sprites[kind], self.square_rect(row, col))
+            self._drawn = position, markers
+            return [self.window.get_rect()]
+
+        drawn_position, drawn_markers = self._drawn
+        if position == drawn_position and markers == drawn_markers:
+            return []
+
+        changed = 0
+        for mask, drawn_mask in zip(position, drawn_position):
+            changed |= mask ^ drawn_mask
+        for row, col in markers ^ drawn_markers:
+            changed |= 1 << square_of(row, col)
+
+        self._drawn = position, markers
+        return [self._draw_square(position, markers, square) for square in squares(changed)]
+
+    def update(self, board: Board) -> list[pygame.Rect]:
+        """ Draw what changed and push only those rectangles to the display """
+
+        start = time.perf_counter()
+        rects = self.draw(board)
+        if rects:
+            pygame.display.update(rects)
+        self.frames.record(time.perf_counter() - start, bool(rects))
+        return rects
+
+    def draw_moves(self, board: Board, piece: Piece):
+        """ Debug view of one piece's moves, as the search sees them """
+
+        valid_moves = board.get_valid_moves(piece)
+        self.invalidate()
+        self.draw(board)
+        pygame.draw.circle(
+            self.window, (0, 255, 0), self.square_rect(piece.row, piece.col).center, 50, 5
+        )
+        self.draw_valid_moves(valid_moves)
+        # The overlay is not part of the tracked state
+        self.invalidate()
+        pygame.display.update()
+        pygame.time.delay(100)
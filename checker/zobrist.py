@@ -0,0 +1,48 @@
+""" Zobrist keys for hashing bitboard positions """
+import random
+
+from checker.bitboard import RED, SQUARES, WHITE, Bitboard, Undo, squares
+
+
+# Fixed seed so keys, and anything stored by hash, agree across processes
+_random = random.Random(0x5EED)
+
+# PIECE_KEYS[side][king][square]
+PIECE_KEYS = tuple(
+    tuple(
+        tuple(_random.getrandbits(64) for _ in range(SQUARES))
+        for _ in range(2)
+    )
+    for _ in (RED, WHITE)
+)
+SIDE_KEYS = (_random.getrandbits(64), _random.getrandbits(64))
+
+
+def hash_bitboard(bitboard: Bitboard) -> int:
+    """ Full hash of a position, used to seed the incremental one """
+
+    key = 0
+    for side in (RED, WHITE):
+        for square in squares(bitboard.men[side]):
+            key ^= PIECE_KEYS[side][0][square]
+        for square in squares(bitboard.kings[side]):
+            key ^= PIECE_KEYS[side][1][square]
+    return key
+
+
+def move_key(undo: Undo) -> int:
+    """ Hash delta of a move, the same value applies and takes it back """
+
+    move, side = undo.move, undo.side
+    keys = PIECE_KEYS[side]
+    key = keys[undo.king][move.source] \
+        ^ keys[undo.king or undo.promoted][move.target]
+
+    if move.captured:
+        opponent = PIECE_KEYS[1 - side]
+        for square in squares(move.captured & ~undo.captured_kings):
+            key ^= opponent[0][square]
+        for square in squares(undo.captured_kings):
+            key ^= opponent[1][square]
+
+    return key
@@ -0,0 +1,307 @@
+"""
+Asyncio server hosting many human-vs-AI games in one process.
+
+Clients speak newline-delimited JSON over TCP or a Unix socket, one game
+per connection. Moves use the notation of `checker.notation`:
+
+    -> {"type": "new", "human": "white", "budget_ms": 500}
+    <- {"type": "state", "position": "W:W43-72:R1-30", "moves": ["44-38", ...], ...}
+    -> {"type": "move", "move": "44-38"}
+    <- {"type": "state", "ai": "26-32", "position": ..., "moves": [...], ...}
+
+Searches run in a shared process pool. At most `workers` run at once and
+at most `max_pending` more wait for a slot. Past that the AI does not
+move: the state comes back with "busy": true and the client asks again
+later with {"type": "state"}. New games past `max_sessions` are answered
+with {"type": "busy"}.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from ai.book import OpeningBook
+from ai.pool import init_worker, worker_algorithm
+from checker.bitboard import RED, WHITE, Move, Position
+from checker.board import Board
+from checker.constants import Colors
+from checker.notation import format_play, format_position, parse_play, winner_name
+
+
+# Least time a search gets, however long it waited for a worker
+MIN_BUDGET_MS = 50
+MAX_BUDGET_MS = 10_000
+# Longest request line accepted, a move is a few dozen bytes
+LINE_LIMIT = 1 << 12
+
+
+def _search(position: Position, max_player: bool, budget_ms: int) -> tuple[float, Move | None, int]:
+    # The worker's transposition table is shared by every game
+    value, play, depth = worker_algorithm().iterative_deepening(
+        Board.from_position(position), max_player, budget_ms
+    )
+    return value, play.move() if play is not None else None, depth
+
+
+def _reject_constant(name: str):
+    raise ValueError(f"{name} is not allowed")
+
+
+class Busy(Exception):
+    """ The server has no room for another search or session """
+
+
+@dataclass
+class Session:
+    human: int
+    budget_ms: int
+    board: Board = field(default_factory=Board)
+    # White moves first, as in `Game`
+    side: int = WHITE
+    winner: str | None = None
+    plies: int = 0
+
+    @property
+    def ai(self) -> int:
+        return 1 - self.human
+
+    def play(self, move: Move):
+        self.board.make_move(move)
+        self.side = 1 - self.side
+        self.plies += 1
+        self.winner = winner_name(self.board.check_winner())
+
+
+@dataclass
+class ServerStats:
+    sessions: int = 0
+    active: int = 0
+    searches: int = 0
+    book_moves: int = 0
+    rejected: int = 0
+    # Searches running or waiting for a worker
+    pending: int = 0
+    search_seconds: float = 0.0
+    queue_seconds: float = 0.0
+
+
+class GameServer:
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_pending: int | None = None,
+        max_sessions: int = 1000,
+        default_budget_ms: int = 500
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers * 4 if max_pending is None else max_pending
+        self.max_sessions = max_sessions
+        self.default_budget_ms = default_budget_ms
+
+        self.logger = logging.getLogger(__name__)
+        self.stats = ServerStats()
+        self.book = OpeningBook()
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_worker
+            )
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def serve(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        path: str | None = None
+    ) -> asyncio.AbstractServer:
+        self._slots = asyncio.Semaphore(self.workers)
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT)
+        self.logger.info(f"Serving on {path or f'{host}:{port}'} with {self.workers} workers")
+        return server
+
+    async def ai_move(self, session: Session) -> tuple[float, Move | None, int]:
+        """ Book move, or a search once a worker is free, budget reduced by the wait """
+
+        play = self.book.choose(session.board, Colors.RED if session.ai == RED else Colors.WHITE)
+        if play is not None:
+            self.stats.book_moves += 1
+            return 0.0, play.move(), 0
+
+        if self.stats.pending >= self.workers + self.max_pending:
+            self.stats.rejected += 1
+            raise Busy()
+
+        assert self._slots is not None
+        self.stats.pending += 1
+        queued = time.perf_counter()
+        try:
+            async with self._slots:
+                started = time.perf_counter()
+                waited_ms = (started - queued) * 1000
+                budget = max(MIN_BUDGET_MS, round(session.budget_ms - waited_ms))
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, _search,
+                    session.board.position(), session.ai == RED, budget
+                )
+        finally:
+            self.stats.pending -= 1
+
+        self.stats.searches += 1
+        self.stats.queue_seconds += started - queued
+        self.stats.search_seconds += time.perf_counter() - started
+        return result
+
+    def state(self, session: Session, **extra) -> dict:
+        color = Colors.RED if session.side == RED else Colors.WHITE
+        moves = [] if session.winner or session.side != session.human else [
+            format_play(session.board.describe(move)) for move in session.board.get_moves(color)
+        ]
+        return {
+            "type": "state",
+            "position": format_position(session.board.position(), session.side),
+            "to_move": "red" if session.side == RED else "white",
+            "moves": moves,
+            "winner": session.winner,
+            "plies": session.plies,
+            **extra,
+        }
+
+    async def reply(self, session: Session) -> dict:
+        """ Let the AI move if it is its turn, then describe the game """
+
+        if session.winner or session.side != session.ai:
+            return self.state(session)
+
+        try:
+            value, move, depth = await self.ai_move(session)
+        except Busy:
+            return self.state(session, busy=True)
+        if move is None:
+            return self.state(session)
+
+        text = format_play(session.board.describe(move))
+        session.play(move)
+        return self.state(session, ai=text, value=value, depth=depth)
+
+    async def request(self, session: Session | None, message: dict) -> tuple[Session | None, dict]:
+        if not isinstance(message, dict):
+            raise ValueError("Requests are JSON objects")
+        kind = message.get("type")
+
+        if kind == "new":
+            if session is None and self.stats.active >= self.max_sessions:
+                raise Busy()
+            human = WHITE if message.get("human", "white") == "white" else RED
+            budget_ms = message.get("budget_ms", self.default_budget_ms)
+            if not isinstance(budget_ms, int) or isinstance(budget_ms, bool) \
+                    or not 0 < budget_ms <= MAX_BUDGET_MS:
+                raise ValueError(f"budget_ms must be between 1 and {MAX_BUDGET_MS}")
+            if session is None:
+                self.stats.sessions += 1
+                self.stats.active += 1
+            session = Session(human, budget_ms)
+            return session, await self.reply(session)
+
+        if session is None:
+            raise ValueError('Start a game with {"type": "new"} first')
+
+        if kind == "move":
+            if session.winner:
+                raise ValueError(f"The game is over, {session.winner} won")
+            if session.side != session.human:
+                raise ValueError("Not your turn")
+            text = message.get("move")
+            if not isinstance(text, str):
+                raise ValueError("move must be a string such as \"44-38\"")
+            session.play(parse_play(session.board.bitboard, session.side, text))
+            return session, await self.reply(session)
+
+        if kind == "state":
+            return session, await self.reply(session)
+
+        raise ValueError(f"Unknown request type {kind!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session: Session | None = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    break
+                if not line:
+                    break
+
+                try:
+                    session, response = await self.request(
+                        session, json.loads(line, parse_constant=_reject_constant)
+                    )
+                except Busy:
+                    response = {"type": "busy"}
+                except (ValueError, TypeError) as error:
+                    response = {"type": "error", "error": str(error)}
+                except Exception:
+                    # A bad request or a failed search must not end the session
+                    self.logger.exception(f"Request failed: {line[:200]!r}")
+                    response = {"type": "error", "error": "Internal error"}
+
+                writer.write(json.dumps(response).encode() + b'\n')
+                # Waits while the client is not reading, instead of buffering for it
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                self.stats.active -= 1
+            writer.close()
+
+
+async def _main(args: argparse.Namespace):
+    server = GameServer(args.workers, args.max_pending, args.max_sessions, args.budget_ms)
+    try:
+        listener = await server.serve(args.host, args.port, args.unix)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host human-vs-AI games over a socket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument(
+        '--max-pending', type=int, default=None,
+        help='searches allowed to wait for a worker before moves are refused, 4 per worker by default'
+    )
+    parser.add_argument('--max-sessions', type=int, default=1000)
+    parser.add_argument('--budget-ms', type=int, default=500, help='default time per AI move')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
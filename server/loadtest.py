@@ -0,0 +1,140 @@
+""" Concurrent sessions against `server.app`, reporting AI move latency percentiles """
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class LoadResult:
+    # Seconds from sending a move to receiving the AI's reply, busy retries included
+    latencies: list[float] = field(default_factory=list)
+    games: int = 0
+    finished: int = 0
+    busy: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+    def percentile(self, percent: float) -> float:
+        if len(self.latencies) < 2:
+            return self.latencies[0] if self.latencies else 0.0
+        return statistics.quantiles(self.latencies, n=100, method='inclusive')[round(percent) - 1]
+
+    def summary(self) -> dict:
+        return {
+            "games": self.games,
+            "finished": self.finished,
+            "moves": len(self.latencies),
+            "moves_per_second": len(self.latencies) / self.seconds if self.seconds else 0.0,
+            "busy": self.busy,
+            "errors": self.errors,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": max(self.latencies, default=0.0) * 1000,
+        }
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    message: dict
+) -> dict:
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Server closed the connection")
+    return json.loads(line)
+
+
+async def play_session(
+    connect,
+    result: LoadResult,
+    moves: int,
+    budget_ms: int,
+    retry_ms: int,
+    rng: random.Random
+):
+    """ Play random human moves until the game ends or `moves` were answered """
+
+    reader, writer = await connect()
+    try:
+        state = await _request(reader, writer, {"type": "new", "budget_ms": budget_ms})
+        while state["type"] == "busy":
+            result.busy += 1
+            await asyncio.sleep(retry_ms / 1000)
+            state = await _request(reader, writer, {"type": "new", "budget_ms": budget_ms})
+        result.games += 1
+
+        for _ in range(moves):
+            if state.get("winner") or not state.get("moves"):
+                result.finished += 1
+                break
+
+            start = time.perf_counter()
+            state = await _request(
+                reader, writer, {"type": "move", "move": rng.choice(state["moves"])}
+            )
+            while state.get("busy"):
+                result.busy += 1
+                await asyncio.sleep(retry_ms / 1000)
+                state = await _request(reader, writer, {"type": "state"})
+            if state["type"] == "error":
+                result.errors += 1
+                break
+            result.latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run(
+    sessions: int,
+    moves: int,
+    budget_ms: int,
+    host: str = '127.0.0.1',
+    port: int = 8765,
+    path: str | None = None,
+    retry_ms: int = 50,
+    seed: int = 0
+) -> LoadResult:
+    def connect():
+        if path is not None:
+            return asyncio.open_unix_connection(path)
+        return asyncio.open_connection(host, port)
+
+    result = LoadResult()
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(
+        play_session(connect, result, moves, budget_ms, retry_ms, random.Random(seed + session))
+        for session in range(sessions)
+    ), return_exceptions=True)
+    result.seconds = time.perf_counter() - start
+    result.errors += sum(isinstance(outcome, BaseException) for outcome in outcomes)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='connect to this Unix socket instead of TCP')
+    parser.add_argument('--sessions', type=int, default=100, help='concurrent games')
+    parser.add_argument('--moves', type=int, default=10, help='human moves per game')
+    parser.add_argument('--budget-ms', type=int, default=200)
+    parser.add_argument('--retry-ms', type=int, default=50, help='wait before asking a busy server again')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(
+        args.sessions, args.moves, args.budget_ms,
+        args.host, args.port, args.unix, args.retry_ms, args.seed
+    ))
+    print(json.dumps(result.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
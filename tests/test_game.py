@@ -0,0 +1,79 @@
+""" Input while the AI's background search is running """
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+import pytest
+
+from ai.book import OpeningBook
+from checker.bitboard import RED
+from checker.constants import Colors, Dimensions
+from checker.game import Game
+
+
+@pytest.fixture
+def game(tmp_path):
+    pygame.init()
+    game = Game(pygame.display.set_mode((Dimensions.WIDTH, Dimensions.HEIGHT)), time_budget=300)
+    # Searched, never played from a book
+    game.book = OpeningBook(str(tmp_path / 'missing.book'))
+    yield game
+    game.worker.cancel()
+    pygame.quit()
+
+
+def _human_move(game: Game):
+    for row in range(Dimensions.ROW):
+        for col in range(Dimensions.COL):
+            piece = game.board.get_piece(row, col)
+            if piece is not None and piece.color == game.human:
+                game.select_piece(row, col)
+                if game.valid_moves:
+                    game.move_piece(*game.valid_moves[0])
+                    return
+    raise AssertionError('The human has no move')
+
+
+def _wait(game: Game):
+    while game.worker.busy:
+        time.sleep(0.01)
+
+
+def test_clicks_are_ignored_during_search(game):
+    _human_move(game)
+    game.poll_ai()
+    assert game.worker.busy
+
+    position = game.board.position()
+    for row in range(Dimensions.ROW):
+        for col in range(Dimensions.COL):
+            game.select_piece(row, col)
+            for target in list(game.valid_moves):
+                game.move_piece(*target)
+    assert game.selected_piece is None
+    assert game.board.position() == position
+
+    _wait(game)
+    game.poll_ai()
+    assert game.current_player == game.human
+    assert game.board.position() != position
+
+
+def test_outdated_search_result_is_dropped(game):
+    _human_move(game)
+    game.poll_ai()
+    assert game.worker.busy
+
+    game.board.make_move(game.board.bitboard.moves(RED)[0])
+    position = game.board.position()
+    _wait(game)
+    game.poll_ai()
+
+    assert game.board.position() == position
+    assert game.current_player == Colors.RED
+    # The next poll searches again from the board as it is now
+    game.poll_ai()
+    assert game.worker.busy
+    assert game.worker.root == position